@@ -0,0 +1,110 @@
+from panda3d.core import ConfigVariableInt
+
+# Enemies beyond the nearest crowd-lod-count animate their looping
+# animations at 1 / crowd-lod-stride of the frame rate.
+crowd_lod_count = ConfigVariableInt("crowd-lod-count", 8)
+crowd_lod_stride = ConfigVariableInt("crowd-lod-stride", 2)
+
+# Throttled enemies have to come this many ranks closer than
+# crowd-lod-count before they animate at full rate again, so that they
+# don't switch back and forth at the boundary.
+CROWD_LOD_MARGIN = 2
+
+
+def crowd_stride(rank, throttled=False):
+    count = crowd_lod_count.getValue()
+    if throttled:
+        count -= CROWD_LOD_MARGIN
+    if rank < count:
+        return 1
+    return max(1, crowd_lod_stride.getValue())
+
+
+class Animator:
+    __slots__ = ("actor", "controls", "bundles", "state", "looping", "stride", "posing", "poseTime", "poseTicks",
+                 "impostor")
+
+    def __init__(self, actor, anim_names):
+        self.actor = actor
+
+        # Looked up once; anims the model lacks are cached as None
+        self.controls = {}
+        for anim_name in anim_names:
+            self.controls[anim_name] = actor.getAnimControl(anim_name)
+        self.bundles = [actor.getPartBundle(part_name) for part_name in actor.getPartNames()]
+
+        self.state = None
+        self.looping = False
+
+        # Looping animations are posed by hand when throttled
+        self.stride = 1
+        self.posing = False
+        self.poseTime = 0
+        self.poseTicks = 0
+
+        # Drawn as a card by the ImpostorRenderer; see Impostors.py
+        self.impostor = False
+
+    def is_playing(self, anim_name):
+        control = self.controls.get(anim_name)
+        return control is not None and control.isPlaying()
+
+    def loop(self, anim_name):
+        if self.looping and self.state == anim_name:
+            return
+
+        self.state = anim_name
+        self.looping = True
+        self.start_loop()
+
+    def play(self, anim_name):
+        self.state = anim_name
+        self.looping = False
+        self.posing = False
+
+        control = self.controls.get(anim_name)
+        if control is not None:
+            control.play()
+
+    def set_stride(self, stride):
+        if stride == self.stride:
+            return
+
+        self.stride = stride
+        if self.looping and self.posing != (stride > 1):
+            # Carry on from the current frame rather than the first
+            self.start_loop(False)
+
+    def start_loop(self, restart=True):
+        control = self.controls.get(self.state)
+        if control is None:
+            return
+
+        if self.stride > 1:
+            self.posing = True
+            self.poseTicks = 0
+            self.poseTime = 0 if restart else control.getFullFframe() / control.getFrameRate()
+            self.pose(control)
+        else:
+            self.posing = False
+            control.loop(restart)
+
+    def pose(self, control):
+        control.pose(int(self.poseTime * control.getFrameRate()) % control.getNumFrames())
+
+    def update(self, dt):
+        if self.posing:
+            self.poseTime += dt
+            self.poseTicks += 1
+            if self.poseTicks >= self.stride:
+                self.poseTicks = 0
+                self.pose(self.controls[self.state])
+
+        # The card only needs the control's current frame, not the joints
+        if self.impostor:
+            return
+
+        # Compute the joints now rather than during cull, so that the
+        # cost shows up in the game's animation time.
+        for bundle in self.bundles:
+            bundle.update()
@@ -0,0 +1,147 @@
+import math
+
+from panda3d.core import CollisionNode
+from panda3d.core import ConfigVariableBool
+
+# Every pushed body is a sphere in a flat, axis-aligned arena, so when
+# this is set the player and the traps are resolved here as circles
+# rather than by CollisionHandlerPusher. The rays and attack segments
+# still go through base.cTrav either way.
+analytic_collisions = ConfigVariableBool("analytic-collisions", False)
+
+
+# Stands in for the CollisionEntry that the pusher's events carry
+class Contact:
+    __slots__ = ("fromNodePath", "intoNodePath")
+
+    def __init__(self, from_node_path, into_node_path):
+        self.fromNodePath = from_node_path
+        self.intoNodePath = into_node_path
+
+    def getFromNodePath(self):
+        return self.fromNodePath
+
+    def getIntoNodePath(self):
+        return self.intoNodePath
+
+
+class ArenaBody:
+    __slots__ = ("collider", "mover", "name", "radius", "fromMask", "intoMask")
+
+    def __init__(self, collider, mover):
+        collider_node = collider.node()
+        self.collider = collider
+        self.mover = mover
+        self.name = collider_node.getName()
+        self.radius = collider_node.getSolid(0).getRadius()
+
+        # Bodies without a mover are only ever pushed against
+        self.fromMask = 0
+        if mover is not None:
+            self.fromMask = collider_node.getFromCollideMask().getWord()
+        self.intoMask = collider_node.getIntoCollideMask().getWord()
+
+
+class ArenaCollider:
+    def __init__(self, render, wall_node_path, half_extent, wall_radius):
+        self.render = render
+
+        # The four walls, as centre lines at +-half_extent
+        self.wallNodePath = wall_node_path
+        self.wallLimit = half_extent - wall_radius
+        self.wallMask = CollisionNode.getDefaultCollideMask().getWord()
+
+        self.bodies = []
+
+        # (body, body or wall side) pairs touching after the last pass
+        self.contacts = set()
+
+    def add(self, collider, mover=None):
+        self.bodies.append(ArenaBody(collider, mover))
+
+    def remove(self, collider):
+        self.bodies = [body for body in self.bodies if body.collider != collider]
+        self.contacts = set(contact for contact in self.contacts
+                            if contact[0].collider != collider and
+                            (isinstance(contact[1], str) or contact[1].collider != collider))
+
+    def clear(self):
+        self.bodies = []
+        self.contacts = set()
+
+    def update(self):
+        bodies = self.bodies
+        render = self.render
+
+        positions = [body.collider.getPos(render) for body in bodies]
+        xs = [pos.x for pos in positions]
+        ys = [pos.y for pos in positions]
+
+        contacts = set()
+        shoves = []
+
+        # Every body is tested against the positions from the start of the
+        # pass and pushed fully out of whatever it overlaps, as the pusher
+        # does for each of its "from" colliders.
+        for i, body in enumerate(bodies):
+            if body.fromMask == 0:
+                continue
+
+            x = xs[i]
+            y = ys[i]
+            radius = body.radius
+            shove_x = 0
+            shove_y = 0
+
+            if body.fromMask & self.wallMask:
+                limit = self.wallLimit - radius
+                if x > limit:
+                    shove_x += limit - x
+                    contacts.add((body, "+x"))
+                elif x < -limit:
+                    shove_x += -limit - x
+                    contacts.add((body, "-x"))
+                if y > limit:
+                    shove_y += limit - y
+                    contacts.add((body, "+y"))
+                elif y < -limit:
+                    shove_y += -limit - y
+                    contacts.add((body, "-y"))
+
+            for j, other in enumerate(bodies):
+                if j == i or not body.fromMask & other.intoMask:
+                    continue
+
+                dx = x - xs[j]
+                dy = y - ys[j]
+                reach = radius + other.radius
+                distance_squared = dx * dx + dy * dy
+                if distance_squared >= reach * reach:
+                    continue
+
+                distance = math.sqrt(distance_squared)
+                if distance > 0:
+                    overlap = (reach - distance) / distance
+                    shove_x += dx * overlap
+                    shove_y += dy * overlap
+                else:
+                    shove_x += reach
+                contacts.add((body, other))
+
+            if shove_x != 0 or shove_y != 0:
+                shoves.append((body, positions[i], shove_x, shove_y))
+
+        for body, pos, shove_x, shove_y in shoves:
+            body.mover.setPos(render, pos.x + shove_x, pos.y + shove_y, pos.z)
+
+        # Like the pusher's in-pattern, only new contacts raise events
+        new_contacts = contacts - self.contacts
+        self.contacts = contacts
+        for body, into in new_contacts:
+            if isinstance(into, str):
+                contact = Contact(body.collider, self.wallNodePath)
+                into_name = "wall"
+            else:
+                contact = Contact(body.collider, into.collider)
+                into_name = into.name
+            messenger.send("%s-into-%s" % (body.name, into_name), [contact])
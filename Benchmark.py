@@ -0,0 +1,199 @@
+import argparse
+import csv
+import math
+import random
+import sys
+import time
+
+from panda3d.core import ClockObject
+from panda3d.core import Vec2
+from panda3d.core import loadPrcFileData
+
+from SceneStats import RenderTimer, count_render_states, count_scene
+
+# Each phase of the scripted scenario is held for this many frames
+PHASE_LENGTH = 90
+SCENARIO = [
+    {"up": True, "down": False, "left": False, "right": False, "shoot": True},
+    {"up": False, "down": False, "left": False, "right": True, "shoot": True},
+    {"up": False, "down": True, "left": False, "right": False, "shoot": False},
+    {"up": False, "down": False, "left": True, "right": False, "shoot": True}
+]
+
+COLUMNS = ["frame", "enemies", "frameTime", "simulationTime", "collisionTime", "animationTime", "cullTime",
+           "drawTime", "nodes", "geoms", "stateChanges", "lightStateChanges", "newRenderStates", "uiDrawCalls",
+           "inputLatency", "impostors"]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Render the game offscreen with the software "
+                                                 "renderer and report per-frame render cost.")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--size", default="1000x750")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write per-frame samples to this CSV file")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="leave the adaptive quality controller running")
+    parser.add_argument("--collisions", choices=["pusher", "analytic"], default="pusher",
+                        help="resolve the player and traps with CollisionHandlerPusher "
+                             "or with the analytic circle resolver")
+    parser.add_argument("--enemies", type=int, default=None,
+                        help="raise the enemy limit from the game's own maximum")
+    parser.add_argument("--impostors", action="store_true",
+                        help="draw distant and excess enemies as cards from a sprite sheet")
+    return parser.parse_args(argv)
+
+
+class Benchmark:
+    def __init__(self, game, frames, warmup):
+        self.game = game
+        self.frames = frames
+        self.warmup = warmup
+
+        self.frame = 0
+        self.samples = []
+        self.simulationTime = 0
+        self.collisionStart = 0
+        self.collisionTime = 0
+
+        self.renderTimer = RenderTimer(game.win)
+
+        # Time the game's own update separately from the rest of the frame
+        game.taskMgr.remove(game.updateTask)
+        game.updateTask = game.taskMgr.add(self.timed_update, "update")
+
+        # The traverser and the arena resolver both run at sort 30
+        game.taskMgr.add(self.start_collisions, "startCollisions", sort=29)
+        game.taskMgr.add(self.end_collisions, "endCollisions", sort=31)
+
+    def timed_update(self, task):
+        start = time.perf_counter()
+        result = self.game.update(task)
+        self.simulationTime = time.perf_counter() - start
+        return result
+
+    def start_collisions(self, task):
+        self.collisionStart = time.perf_counter()
+        return task.cont
+
+    def end_collisions(self, task):
+        self.collisionTime = time.perf_counter() - self.collisionStart
+        return task.cont
+
+    def apply_scenario(self):
+        game = self.game
+        keys = SCENARIO[(self.frame // PHASE_LENGTH) % len(SCENARIO)]
+        for control_name, pressed in keys.items():
+            game.input.record(control_name, pressed)
+
+        # There is no mouse offscreen, so sweep the aim around the player
+        angle = self.frame * 0.05
+        game.input.mousePos = Vec2(math.cos(angle), math.sin(angle)) * 0.5
+
+        # Keep the player alive so that the whole run is spent in-game
+        if game.player.health < game.player.maxHealth:
+            game.player.health = game.player.maxHealth
+            game.player.update_health_ui()
+
+    def run(self):
+        game = self.game
+        game.start_game()
+        game.maxEnemies = game.maximumMaxEnemies
+        game.spawnInterval = game.minimumSpawnInterval
+
+        for self.frame in range(self.warmup + self.frames):
+            self.apply_scenario()
+            self.renderTimer.reset()
+
+            start = time.perf_counter()
+            game.taskMgr.step()
+            frame_time = time.perf_counter() - start
+
+            if self.frame < self.warmup:
+                continue
+
+            scene_counts = count_scene(game.render, game.render2d)
+            self.samples.append({
+                "frame": self.frame - self.warmup,
+                "enemies": len(game.enemies),
+                "frameTime": frame_time,
+                "simulationTime": self.simulationTime,
+                "collisionTime": self.collisionTime,
+                "animationTime": game.animationTime,
+                "cullTime": self.renderTimer.cullTime,
+                "drawTime": self.renderTimer.drawTime,
+                "nodes": scene_counts["nodes"],
+                "geoms": scene_counts["geoms"],
+                "stateChanges": count_render_states(game.render, game.render2d),
+                # Whether the lights on the root changed over the previous frame
+                "lightStateChanges": game.lights.stateChanges,
+                "newRenderStates": game.lights.newStates,
+                "uiDrawCalls": game.count_ui_draw_calls(),
+                # Largest delay from a key edge to the end of the frame that drew it
+                "inputLatency": game.input.frameLatency,
+                "impostors": game.impostors.count if game.impostors is not None else 0
+            })
+
+        self.renderTimer.cleanup()
+        return self.samples
+
+
+def summarise(samples):
+    lines = ["%-18s %12s %12s %12s" % ("", "mean", "p95", "max")]
+    for column in COLUMNS[2:]:
+        values = sorted(sample[column] for sample in samples)
+        mean = sum(values) / len(values)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        if column.endswith("Time") or column.endswith("Latency"):
+            lines.append("%-18s %10.3fms %10.3fms %10.3fms" % (column, mean * 1000, p95 * 1000, values[-1] * 1000))
+        else:
+            lines.append("%-18s %12.1f %12d %12d" % (column, mean, p95, values[-1]))
+    return "\n".join(lines)
+
+
+def main(argv):
+    args = parse_args(argv)
+    width, height = args.size.split("x")
+
+    loadPrcFileData("benchmark", "\n".join([
+        "window-type offscreen",
+        "load-display p3tinydisplay",
+        "win-size %s %s" % (width, height),
+        "audio-library-name null",
+        "sync-video false",
+        "clock-mode non-real-time",
+        "clock-frame-rate 60",
+        "quality-adaptive %s" % ("true" if args.adaptive else "false"),
+        "analytic-collisions %s" % ("true" if args.collisions == "analytic" else "false"),
+        "impostors %s" % ("true" if args.impostors else "false")
+    ]))
+
+    random.seed(args.seed)
+
+    from Game import Game
+    game = Game()
+    if args.enemies is not None:
+        game.maximumMaxEnemies = args.enemies
+    ClockObject.getGlobalClock().setMode(ClockObject.MNonRealTime)
+
+    samples = Benchmark(game, args.frames, args.warmup).run()
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as output_file:
+            writer = csv.DictWriter(output_file, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(samples)
+
+    report = game.scene.report
+    print("Static scene: %d -> %d nodes, %d -> %d Geoms after preparation" %
+          (report["before"]["nodes"], report["after"]["nodes"],
+           report["before"]["geoms"], report["after"]["geoms"]))
+    print(summarise(samples))
+
+    game.exit_game()
+    game.destroy()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,126 @@
+import json
+
+from panda3d.core import Filename
+from panda3d.core import PNMImage
+
+# Packs the UI images into a single texture, so that the HUD and menus
+# bind one texture. Re-run this whenever an image in UI/ changes.
+UI_IMAGES = [
+    "UI/stoneFrame.png",
+    "UI/UIButton.png",
+    "UI/UIButtonPressed.png",
+    "UI/UIButtonHighlighted.png",
+    "UI/UIButtonDisabled.png",
+    "UI/health.png"
+]
+
+ATLAS_IMAGE = "UI/atlas.png"
+ATLAS_INDEX = "UI/atlas.json"
+ATLAS_WIDTH = 2048
+
+# Border pixels are repeated into the padding to stop filtering from
+# bleeding neighbouring images into each other.
+PADDING = 2
+
+
+def next_power_of_two(value):
+    result = 1
+    while result < value:
+        result *= 2
+    return result
+
+
+def pack(images):
+    # Skyline packing, tallest images first. The padding of images on the
+    # atlas edges may fall outside it, so pack into a slightly larger area.
+    packing_width = ATLAS_WIDTH + PADDING * 2
+    skyline = [[0, 0, packing_width]]
+
+    placements = {}
+    atlas_height = 0
+    for name in sorted(images, key=lambda name: images[name].getYSize(), reverse=True):
+        width = images[name].getXSize() + PADDING * 2
+        height = images[name].getYSize() + PADDING * 2
+
+        best = None
+        for segment_x, _, _ in skyline:
+            if segment_x + width > packing_width:
+                continue
+            y = max(segment_y for x, segment_y, segment_width in skyline
+                    if x < segment_x + width and x + segment_width > segment_x)
+            if best is None or y < best[1]:
+                best = (segment_x, y)
+
+        if best is None:
+            raise ValueError("%s is wider than the atlas" % name)
+
+        x, y = best
+        placements[name] = (x, y)
+        atlas_height = max(atlas_height, y + height - PADDING * 2)
+
+        # Raise the skyline under the new image
+        new_skyline = []
+        for segment_x, segment_y, segment_width in skyline:
+            segment_end = segment_x + segment_width
+            if segment_x < x:
+                new_skyline.append([segment_x, segment_y, min(segment_end, x) - segment_x])
+            if segment_end > x + width:
+                start = max(segment_x, x + width)
+                new_skyline.append([start, segment_y, segment_end - start])
+        new_skyline.append([x, y + height, width])
+        skyline = sorted(new_skyline)
+
+    return placements, next_power_of_two(atlas_height)
+
+
+def blit_padded(atlas, image, x, y):
+    width = image.getXSize()
+    height = image.getYSize()
+    atlas.copySubImage(image, x, y, 0, 0, width, height)
+
+    for i in range(1, PADDING + 1):
+        atlas.copySubImage(image, x - i, y, 0, 0, 1, height)
+        atlas.copySubImage(image, x + width - 1 + i, y, width - 1, 0, 1, height)
+    for i in range(1, PADDING + 1):
+        atlas.copySubImage(atlas, x - PADDING, y - i, x - PADDING, y, width + PADDING * 2, 1)
+        atlas.copySubImage(atlas, x - PADDING, y + height - 1 + i,
+                           x - PADDING, y + height - 1, width + PADDING * 2, 1)
+
+
+def build():
+    images = {}
+    for path in UI_IMAGES:
+        image = PNMImage(Filename(path))
+        if not image.hasAlpha():
+            image.addAlpha()
+            image.alphaFill(1)
+        images[path] = image
+
+    placements, atlas_height = pack(images)
+
+    atlas = PNMImage(ATLAS_WIDTH, atlas_height, 4)
+    atlas.fill(0, 0, 0)
+    atlas.alphaFill(0)
+
+    regions = {}
+    for path, (x, y) in placements.items():
+        image = images[path]
+        blit_padded(atlas, image, x, y)
+
+        # UVs have their origin at the bottom-left, images at the top-left
+        regions[path] = [
+            x / ATLAS_WIDTH,
+            1.0 - (y + image.getYSize()) / atlas_height,
+            (x + image.getXSize()) / ATLAS_WIDTH,
+            1.0 - y / atlas_height
+        ]
+
+    atlas.write(Filename(ATLAS_IMAGE))
+    with open(ATLAS_INDEX, "w") as index_file:
+        json.dump({"image": ATLAS_IMAGE, "regions": regions}, index_file, indent=4, sort_keys=True)
+
+    print("Packed %d images into %s (%dx%d)" % (len(regions), ATLAS_IMAGE, ATLAS_WIDTH, atlas_height))
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,141 @@
+import math
+import random
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from panda3d.core import ConfigVariableBool
+
+# Decisions run on a worker thread, overlapping with cull and draw. The
+# worker only sees an immutable snapshot taken at the end of the last
+# tick and only produces intents; the main thread owns every component
+# and applies the intents at the start of the next tick.
+ai_threaded = ConfigVariableBool("ai-threaded", True)
+
+ChaserSnapshot = namedtuple("ChaserSnapshot", [
+    "entity", "x", "y", "attackPlaying", "attackDistance", "attackDelay",
+    "attackDelayTimer", "attackWaitTimer", "acceleration"
+])
+TrapSnapshot = namedtuple("TrapSnapshot", [
+    "entity", "x", "y", "moveInX", "moveDirection", "acceleration"
+])
+Snapshot = namedtuple("Snapshot", ["playerX", "playerY", "dt", "chasers", "traps"])
+
+# A velocityChange of None means "stop"
+ChaserIntent = namedtuple("ChaserIntent", [
+    "entity", "heading", "walking", "velocityChange", "attackDelayTimer", "attackWaitTimer",
+    "startAttack", "resolveAttack"
+])
+TrapIntent = namedtuple("TrapIntent", [
+    "entity", "walking", "velocityChange", "snapshotDirection", "moveDirection"
+])
+
+
+def think_chaser(chaser, player_x, player_y, dt, rng):
+    to_player_x = player_x - chaser.x
+    to_player_y = player_y - chaser.y
+    distance_to_player = math.hypot(to_player_x, to_player_y)
+
+    # Signed angle from the y-axis, as Vec2.signedAngleDeg gives it
+    heading = math.degrees(math.atan2(-to_player_x, to_player_y))
+
+    walking = False
+    velocity_change = (0, 0)
+    attack_delay_timer = chaser.attackDelayTimer
+    attack_wait_timer = chaser.attackWaitTimer
+    start_attack = False
+    resolve_attack = False
+
+    if distance_to_player > chaser.attackDistance * 0.9:
+        if not chaser.attackPlaying:
+            walking = True
+            scale = chaser.acceleration * dt / distance_to_player
+            velocity_change = (to_player_x * scale, to_player_y * scale)
+            attack_wait_timer = 0.2
+            attack_delay_timer = 0
+    else:
+        velocity_change = None
+
+        if attack_delay_timer > 0:
+            attack_delay_timer -= dt
+            if attack_delay_timer <= 0:
+                resolve_attack = True
+        elif attack_wait_timer > 0:
+            attack_wait_timer -= dt
+            if attack_wait_timer <= 0:
+                attack_wait_timer = rng.uniform(0.5, 0.7)
+                attack_delay_timer = chaser.attackDelay
+                start_attack = True
+
+    return ChaserIntent(chaser.entity, heading, walking, velocity_change,
+                        attack_delay_timer, attack_wait_timer, start_attack, resolve_attack)
+
+
+def think_trap(trap, player_x, player_y, dt):
+    if trap.moveDirection != 0:
+        change = trap.moveDirection * trap.acceleration * dt
+        if trap.moveInX:
+            velocity_change = (change, 0)
+        else:
+            velocity_change = (0, change)
+        return TrapIntent(trap.entity, True, velocity_change, trap.moveDirection, trap.moveDirection)
+
+    if trap.moveInX:
+        detector = player_y - trap.y
+        movement = player_x - trap.x
+    else:
+        detector = player_x - trap.x
+        movement = player_y - trap.y
+
+    move_direction = 0
+    if abs(detector) < 0.5:
+        move_direction = math.copysign(1, movement)
+    return TrapIntent(trap.entity, False, (0, 0), 0, move_direction)
+
+
+def think(snapshot, rng):
+    chaser_intents = [think_chaser(chaser, snapshot.playerX, snapshot.playerY, snapshot.dt, rng)
+                      for chaser in snapshot.chasers]
+    trap_intents = [think_trap(trap, snapshot.playerX, snapshot.playerY, snapshot.dt)
+                    for trap in snapshot.traps]
+    return chaser_intents, trap_intents
+
+
+class EnemyAI:
+    def __init__(self, entities):
+        self.entities = entities
+        self.threaded = ai_threaded.getValue()
+
+        self.executor = None
+        if self.threaded:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="enemyAI")
+
+        # Intents being worked out from the last tick's snapshot
+        self.pending = None
+
+        # Only ever drawn from by the AI, so that it doesn't interleave with
+        # the main thread's draws; seeded from the main thread's generator
+        # so that seeded runs stay reproducible.
+        self.random = random.Random(random.getrandbits(32))
+
+    def update(self, player_pos, dt):
+        if self.pending is not None:
+            intents = self.pending.result()
+            self.pending = None
+            self.entities.apply_ai_intents(*intents)
+
+        snapshot = self.entities.snapshot_ai(player_pos, dt)
+        if self.executor is not None:
+            self.pending = self.executor.submit(think, snapshot, self.random)
+        else:
+            self.entities.apply_ai_intents(*think(snapshot, self.random))
+
+    def reset(self):
+        if self.pending is not None:
+            self.pending.result()
+            self.pending = None
+
+    def cleanup(self):
+        self.reset()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,316 @@
+from collections import namedtuple
+
+from panda3d.core import Vec3
+
+from Animator import Animator, crowd_stride
+from EnemyAI import ChaserSnapshot, Snapshot, TrapSnapshot
+
+FRICTION = 150.0
+
+
+# Components
+
+class Transform:
+    __slots__ = ("nodePath", "pos")
+
+    def __init__(self, node_path):
+        self.nodePath = node_path
+        self.pos = node_path.getPos()
+
+
+class Kinematics:
+    __slots__ = ("velocity", "maxSpeed", "acceleration", "walking")
+
+    def __init__(self, max_speed, acceleration):
+        self.velocity = Vec3(0, 0, 0)
+        self.maxSpeed = max_speed
+        self.acceleration = acceleration
+        self.walking = False
+
+
+class Vitals:
+    __slots__ = ("health", "maxHealth")
+
+    def __init__(self, max_health):
+        self.health = max_health
+        self.maxHealth = max_health
+
+
+class Audio:
+    __slots__ = ("deathSound", "hurtSound", "attackSound", "impactSound", "stopSound", "movementSound")
+
+    def __init__(self):
+        self.deathSound = None
+        self.hurtSound = None
+        self.attackSound = None
+        self.impactSound = None
+        self.stopSound = None
+        self.movementSound = None
+
+
+# Shared by every chaser of a type
+ChaserStats = namedtuple("ChaserStats", ["attackDistance", "attackDamage", "attackDelay"])
+
+
+class ChaserAI:
+    __slots__ = ("stats", "attackDelayTimer", "attackWaitTimer", "attackSegment", "segmentQueue")
+
+    def __init__(self, stats, attack_segment, segment_queue):
+        self.stats = stats
+        self.attackDelayTimer = 0
+        self.attackWaitTimer = 0
+        self.attackSegment = attack_segment
+        self.segmentQueue = segment_queue
+
+
+class TrapAI:
+    __slots__ = ("moveInX", "moveDirection", "ignorePlayer")
+
+    def __init__(self):
+        self.moveInX = False
+        self.moveDirection = 0
+        self.ignorePlayer = False
+
+
+def component_property(component_name, attribute_name):
+    def get_value(self):
+        return getattr(getattr(self, component_name), attribute_name)
+
+    def set_value(self, value):
+        setattr(getattr(self, component_name), attribute_name, value)
+
+    return property(get_value, set_value)
+
+
+# Storage
+
+class ComponentArray:
+    __slots__ = ("entities", "components", "indices")
+
+    def __init__(self):
+        self.entities = []
+        self.components = []
+        self.indices = {}
+
+    def __len__(self):
+        return len(self.components)
+
+    def add(self, entity, component):
+        self.indices[entity] = len(self.components)
+        self.entities.append(entity)
+        self.components.append(component)
+
+    def remove(self, entity):
+        index = self.indices.pop(entity, None)
+        if index is None:
+            return
+
+        # Keep the arrays dense by moving the last entry into the gap
+        last_entity = self.entities.pop()
+        last_component = self.components.pop()
+        if last_entity != entity:
+            self.entities[index] = last_entity
+            self.components[index] = last_component
+            self.indices[last_entity] = index
+
+    def get(self, entity):
+        index = self.indices.get(entity)
+        if index is None:
+            return None
+        return self.components[index]
+
+
+class EntityStore:
+    def __init__(self):
+        self.nextEntity = 0
+        self.arrays = {}
+        for component_type in [Transform, Kinematics, Vitals, Audio, Animator, ChaserAI, TrapAI]:
+            self.arrays[component_type] = ComponentArray()
+
+    def create(self, *components):
+        entity = self.nextEntity
+        self.nextEntity += 1
+        for component in components:
+            self.add(entity, component)
+        return entity
+
+    def add(self, entity, component):
+        self.arrays[type(component)].add(entity, component)
+
+    def remove(self, entity, component_type):
+        self.arrays[component_type].remove(entity)
+
+    def get(self, entity, component_type):
+        return self.arrays[component_type].get(entity)
+
+    def query(self, component_type):
+        return self.arrays[component_type]
+
+    def destroy(self, entity):
+        for array in self.arrays.values():
+            array.remove(entity)
+
+    # Systems
+
+    def update_kinematics(self, dt):
+        transforms = self.arrays[Transform]
+        kinematics = self.arrays[Kinematics]
+        friction_val = FRICTION * dt
+
+        for entity, body in zip(kinematics.entities, kinematics.components):
+            transform = transforms.get(entity)
+
+            # Collision response may have moved the node since the last tick
+            transform.pos = transform.nodePath.getPos()
+
+            velocity = body.velocity
+            speed = velocity.length()
+            if speed > body.maxSpeed:
+                velocity.normalize()
+                velocity *= body.maxSpeed
+                speed = body.maxSpeed
+
+            if not body.walking:
+                if friction_val > speed:
+                    velocity.set(0, 0, 0)
+                    speed = 0
+                else:
+                    friction_vec = -velocity
+                    friction_vec.normalize()
+                    friction_vec *= friction_val
+
+                    velocity += friction_vec
+
+            if speed > 0:
+                transform.pos += velocity * dt
+                transform.nodePath.setPos(transform.pos)
+
+    def snapshot_ai(self, player_pos, dt):
+        transforms = self.arrays[Transform]
+        kinematics = self.arrays[Kinematics]
+        animators = self.arrays[Animator]
+        chasers = self.arrays[ChaserAI]
+        traps = self.arrays[TrapAI]
+
+        chaser_snapshots = []
+        for entity, ai in zip(chasers.entities, chasers.components):
+            pos = transforms.get(entity).pos
+            chaser_snapshots.append(ChaserSnapshot(entity, pos.x, pos.y,
+                                                   animators.get(entity).is_playing("attack"),
+                                                   ai.stats.attackDistance,
+                                                   ai.stats.attackDelay,
+                                                   ai.attackDelayTimer,
+                                                   ai.attackWaitTimer,
+                                                   kinematics.get(entity).acceleration))
+
+        trap_snapshots = []
+        for entity, ai in zip(traps.entities, traps.components):
+            pos = transforms.get(entity).pos
+            trap_snapshots.append(TrapSnapshot(entity, pos.x, pos.y,
+                                               ai.moveInX,
+                                               ai.moveDirection,
+                                               kinematics.get(entity).acceleration))
+
+        return Snapshot(player_pos.x, player_pos.y, dt, chaser_snapshots, trap_snapshots)
+
+    def apply_ai_intents(self, chaser_intents, trap_intents):
+        transforms = self.arrays[Transform]
+        kinematics = self.arrays[Kinematics]
+        animators = self.arrays[Animator]
+        audio = self.arrays[Audio]
+        chasers = self.arrays[ChaserAI]
+        traps = self.arrays[TrapAI]
+
+        for intent in chaser_intents:
+            entity = intent.entity
+            ai = chasers.get(entity)
+            if ai is None:
+                # Died since the snapshot was taken
+                continue
+
+            body = kinematics.get(entity)
+            body.walking = intent.walking
+            if intent.velocityChange is None:
+                body.velocity.set(0, 0, 0)
+            else:
+                body.velocity.addX(intent.velocityChange[0])
+                body.velocity.addY(intent.velocityChange[1])
+
+            ai.attackDelayTimer = intent.attackDelayTimer
+            ai.attackWaitTimer = intent.attackWaitTimer
+
+            if intent.resolveAttack and ai.segmentQueue.getNumEntries() > 0:
+                ai.segmentQueue.sortEntries()
+                segment_hit = ai.segmentQueue.getEntry(0)
+
+                hit_node_path = segment_hit.getIntoNodePath()
+                if hit_node_path.hasPythonTag("owner"):
+                    hit_object = hit_node_path.getPythonTag("owner")
+                    hit_object.alter_health(ai.stats.attackDamage)
+                    ai.attackWaitTimer = 1.0
+
+            if intent.startAttack:
+                animators.get(entity).play("attack")
+                base.quality.play_sound(audio.get(entity).attackSound)
+
+            transform = transforms.get(entity)
+            node_path = transform.nodePath
+            node_path.setH(intent.heading)
+
+            ai.attackSegment.setPointA(transform.pos)
+            ai.attackSegment.setPointB(transform.pos + node_path.getQuat().getForward() * ai.stats.attackDistance)
+
+        for intent in trap_intents:
+            entity = intent.entity
+            ai = traps.get(entity)
+            if ai is None:
+                continue
+
+            body = kinematics.get(entity)
+            if ai.moveDirection != intent.snapshotDirection:
+                # Stopped by a collision since the snapshot was taken, so
+                # friction should apply from this tick
+                if ai.moveDirection == 0:
+                    body.walking = False
+                continue
+
+            body.walking = intent.walking
+            body.velocity.addX(intent.velocityChange[0])
+            body.velocity.addY(intent.velocityChange[1])
+
+            if intent.moveDirection != ai.moveDirection:
+                ai.moveDirection = intent.moveDirection
+                audio.get(entity).movementSound.play()
+
+    def update_animation_states(self, player_pos):
+        transforms = self.arrays[Transform]
+        kinematics = self.arrays[Kinematics]
+        animators = self.arrays[Animator]
+
+        # Only the chasers nearest the player animate at full rate
+        chasers = sorted(self.arrays[ChaserAI].entities,
+                         key=lambda entity: (transforms.get(entity).pos - player_pos).lengthSquared())
+        crowd_ranks = {}
+        for rank, entity in enumerate(chasers):
+            crowd_ranks[entity] = rank
+
+        for entity, body in zip(kinematics.entities, kinematics.components):
+            animator = animators.get(entity)
+
+            # Enemies already animating at a reduced rate keep to it until
+            # they are clear of both cutoffs by a margin
+            distance_to_player = (transforms.get(entity).pos - player_pos).length()
+            throttled = animator.stride > 1
+            animator.set_stride(max(base.quality.animation_stride(distance_to_player, throttled),
+                                    crowd_stride(crowd_ranks.get(entity, 0), throttled)))
+
+            if body.walking:
+                animator.loop("walk")
+            elif not animator.is_playing("spawn") and not animator.is_playing("attack"):
+                animator.loop("stand")
+
+        return crowd_ranks
+
+    def update_animations(self, dt):
+        for animator in self.arrays[Animator].components:
+            animator.update(dt)
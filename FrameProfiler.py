@@ -0,0 +1,183 @@
+import csv
+import os
+import signal
+import sys
+import threading
+import time
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import ConfigVariableBool, ConfigVariableDouble, ConfigVariableInt
+
+profile_capture_frames = ConfigVariableInt("profile-capture-frames", 300)
+profile_capture_interval = ConfigVariableDouble("profile-capture-interval", 0.001)
+
+# Frame and enemy count are written to a sidecar file next to the stacks;
+# with this set they also become the root of every stack, which splits the
+# flame graph into one tower per frame.
+profile_split_frames = ConfigVariableBool("profile-split-frames", False)
+
+
+def describe_code(code):
+    return "%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class FrameProfiler:
+    notify = directNotify.newCategory("FrameProfiler")
+
+    def __init__(self, game):
+        self.game = game
+
+        self.capturing = False
+        self.framesLeft = 0
+        self.outputPath = None
+        self.previousFunction = None
+
+        # Written by the main thread, read by the sampler
+        self.inUpdate = False
+        self.frame = 0
+        self.enemyCount = 0
+
+        # Where there are interval timers the main thread samples itself
+        # from a signal handler; elsewhere a thread samples it.
+        self.useTimer = hasattr(signal, "setitimer")
+        self.previousHandler = None
+
+        self.mainThreadId = threading.get_ident()
+        self.samplerThread = None
+        self.stopEvent = threading.Event()
+        self.previousSwitchInterval = None
+
+        # Collapsed stack -> number of samples
+        self.stacks = {}
+        self.sampleCount = 0
+
+        # (frame, enemies, samples, update time) for each captured frame
+        self.frameRows = []
+
+    def start(self, frames=None, output_path=None):
+        if self.capturing:
+            return
+
+        self.capturing = True
+        self.framesLeft = frames if frames is not None else profile_capture_frames.getValue()
+        self.outputPath = output_path
+        if self.outputPath is None:
+            self.outputPath = time.strftime("profile-%Y%m%d-%H%M%S.folded")
+        self.stacks = {}
+        self.sampleCount = 0
+        self.frameRows = []
+
+        # Nothing is added to the loop until a capture starts; the game's
+        # update task is wrapped for its duration, then put back.
+        game = self.game
+        self.previousFunction = game.updateTask.getFunction()
+        game.taskMgr.remove(game.updateTask)
+        game.updateTask = game.taskMgr.add(self.profiled_update, "update")
+
+        interval = profile_capture_interval.getValue()
+        if self.useTimer:
+            self.previousHandler = signal.signal(signal.SIGALRM, self.sample_signal)
+            signal.setitimer(signal.ITIMER_REAL, interval, interval)
+        else:
+            # Let the sampler in more often than every 5ms
+            self.previousSwitchInterval = sys.getswitchinterval()
+            sys.setswitchinterval(interval)
+
+            self.stopEvent.clear()
+            self.samplerThread = threading.Thread(target=self.sample_loop, name="frameProfiler", daemon=True)
+            self.samplerThread.start()
+
+        self.notify.info("Capturing %d frames" % self.framesLeft)
+
+    def stop(self):
+        if not self.capturing:
+            return
+
+        self.capturing = False
+        self.inUpdate = False
+
+        if self.useTimer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.previousHandler)
+            self.previousHandler = None
+        else:
+            self.stopEvent.set()
+            self.samplerThread.join()
+            self.samplerThread = None
+            sys.setswitchinterval(self.previousSwitchInterval)
+
+        game = self.game
+        game.taskMgr.remove(game.updateTask)
+        game.updateTask = game.taskMgr.add(self.previousFunction, "update")
+        self.previousFunction = None
+
+        self.write(self.outputPath)
+
+    def toggle(self, frames=None):
+        if self.capturing:
+            self.stop()
+        else:
+            self.start(frames)
+
+    def profiled_update(self, task):
+        self.frame = globalClock.getFrameCount()
+        self.enemyCount = len(self.game.enemies)
+
+        sample_count = self.sampleCount
+        start = time.perf_counter()
+
+        self.inUpdate = True
+        result = self.previousFunction(task)
+        self.inUpdate = False
+
+        self.frameRows.append((self.frame, self.enemyCount, self.sampleCount - sample_count,
+                               time.perf_counter() - start))
+
+        self.framesLeft -= 1
+        if self.framesLeft <= 0:
+            self.stop()
+        return result
+
+    def sample_signal(self, signum, frame):
+        if self.inUpdate:
+            self.record(frame)
+
+    def sample_loop(self):
+        interval = profile_capture_interval.getValue()
+        while not self.stopEvent.wait(interval):
+            if self.inUpdate:
+                self.record(sys._current_frames().get(self.mainThreadId))
+
+    def record(self, frame):
+        # Keep only what is below the update, without the wrapper itself
+        root_code = self.profiled_update.__code__
+        stack = []
+        while frame is not None and frame.f_code is not root_code:
+            stack.append(describe_code(frame.f_code))
+            frame = frame.f_back
+        if frame is None or len(stack) == 0:
+            # Caught the main thread on its way in or out
+            return
+
+        if profile_split_frames.getValue():
+            stack.append("enemies %d" % self.enemyCount)
+            stack.append("frame %d" % self.frame)
+        collapsed = ";".join(reversed(stack))
+        self.stacks[collapsed] = self.stacks.get(collapsed, 0) + 1
+        self.sampleCount += 1
+
+    def write(self, output_path):
+        # One "root;...;leaf count" line per distinct stack, as read by
+        # flamegraph.pl, speedscope and similar tools
+        with open(output_path, "w") as output_file:
+            for collapsed, count in sorted(self.stacks.items()):
+                output_file.write("%s %d\n" % (collapsed, count))
+
+        frames_path = os.path.splitext(output_path)[0] + ".frames.csv"
+        with open(frames_path, "w", newline="") as frames_file:
+            writer = csv.writer(frames_file)
+            writer.writerow(["frame", "enemies", "samples", "updateTime"])
+            writer.writerows(self.frameRows)
+
+        self.notify.info("Wrote %d samples to %s and %d frames to %s" %
+                         (self.sampleCount, output_path, len(self.frameRows), frames_path))
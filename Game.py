@@ -1,24 +1,63 @@
-from direct.gui.DirectGui import *
+import argparse
+import random
+import time
+
+from direct.gui.DirectButton import DirectButton
+from direct.gui.DirectDialog import DirectDialog
+from direct.gui.DirectFrame import DirectFrame
+from direct.gui.DirectLabel import DirectLabel
 from direct.showbase.ShowBase import ShowBase
 from panda3d.core import AmbientLight
 from panda3d.core import CollisionHandlerPusher
+from panda3d.core import CollisionNode
 from panda3d.core import CollisionTraverser
 from panda3d.core import CollisionTube
+from panda3d.core import ConfigVariableBool
 from panda3d.core import DirectionalLight
+from panda3d.core import GraphicsWindow
+from panda3d.core import Vec3, Vec4
 from panda3d.core import WindowProperties
-
-from GameObject import *
+from panda3d.core import loadPrcFileData
+
+from GameObject import Player, TrapEnemy, WalkingEnemy
+from ArenaCollider import ArenaCollider, analytic_collisions
+from EnemyAI import EnemyAI
+from Entities import EntityStore
+from FrameProfiler import FrameProfiler
+from Impostors import ImpostorRenderer, ImpostorSheet
+from Impostors import impostor_cell_size, impostor_frames, impostors_enabled
+from InputPipeline import GroundAim, InputPipeline
+from LightManager import LightManager
+from QualityController import QualityController
+from ScenePreparer import ScenePreparer
+from SceneStats import count_draw_calls
+from StartupTrace import StartupTrace
+from UIAtlas import UIAtlas
+
+# UI that isn't visible on the first frame (the game-over dialog) and the
+# music are only built or loaded once they are needed.
+lazy_startup = ConfigVariableBool("lazy-startup", True)
 
 
 class Game(ShowBase):
     def __init__(self):
+        # Time spent on each step of start-up; see StartupCheck.py
+        self.startupTrace = StartupTrace()
+
         ShowBase.__init__(self)
 
         self.disableMouse()
+        self.startupTrace.mark("showBase")
+
+        self.quality = QualityController()
+        self.entities = EntityStore()
+        self.enemyAI = EnemyAI(self.entities)
 
-        properties = WindowProperties()
-        properties.setSize(1000, 750)
-        self.win.requestProperties(properties)
+        # Offscreen buffers (see Benchmark.py) have a fixed size
+        if isinstance(self.win, GraphicsWindow):
+            properties = WindowProperties()
+            properties.setSize(1000, 750)
+            self.win.requestProperties(properties)
 
         ambient_light = AmbientLight("ambient light")
         ambient_light.setColor(Vec4(0.2, 0.2, 0.2, 1))
@@ -32,22 +71,30 @@ class Game(ShowBase):
 
         self.render.setShaderAuto()
 
+        self.scene = ScenePreparer(self.render)
+
+        # Dynamic lights stay attached; only their colour is animated
+        self.lights = LightManager(self.render, self.scene.get_root("effects"))
+
+        self.startupTrace.mark("lights")
+
         self.environment = self.loader.loadModel("Models/Environment/environment")
-        self.environment.reparentTo(self.render)
+        self.environment.reparentTo(self.scene.staticRoot)
+        self.startupTrace.mark("environment")
 
         # Top down view
         self.camera.setPos(0, 0, 32)
         self.camera.setP(-90)
 
-        self.keyMap = {
-            "up": False,
-            "down": False,
-            "left": False,
-            "right": False,
-            "shoot": False
-        }
+        # Key edges are timestamped so that movement and firing can
+        # use the part of the frame each control was actually held
+        self.input = InputPipeline(["up", "down", "left", "right", "shoot"])
+        self.groundAim = GroundAim(self.camera, self.camLens, self.render)
 
         # Input
+        for button_thrower in self.buttonThrowers or []:
+            button_thrower.node().setTimeFlag(True)
+
         self.accept("w", self.update_key_map, ["up", True])
         self.accept("w-up", self.update_key_map, ["up", False])
         self.accept("s", self.update_key_map, ["down", True])
@@ -58,6 +105,7 @@ class Game(ShowBase):
         self.accept("d-up", self.update_key_map, ["right", False])
         self.accept("mouse1", self.update_key_map, ["shoot", True])
         self.accept("mouse1-up", self.update_key_map, ["shoot", False])
+        self.startupTrace.mark("input")
 
         self.pusher = CollisionHandlerPusher()
         self.cTrav = CollisionTraverser()
@@ -68,27 +116,48 @@ class Game(ShowBase):
         wall_solid = CollisionTube(-8.0, 0, 0, 8.0, 0, 0, 0.2)
         wall_node = CollisionNode("wall")
         wall_node.addSolid(wall_solid)
-        wall = self.render.attachNewNode(wall_node)
+        wall = self.scene.wallRoot.attachNewNode(wall_node)
         wall.setY(8.0)
 
         wall_solid = CollisionTube(-8.0, 0, 0, 8.0, 0, 0, 0.2)
         wall_node = CollisionNode("wall")
         wall_node.addSolid(wall_solid)
-        wall = self.render.attachNewNode(wall_node)
+        wall = self.scene.wallRoot.attachNewNode(wall_node)
         wall.setY(-8.0)
 
         wall_solid = CollisionTube(0, -8.0, 0, 0, 8.0, 0, 0.2)
         wall_node = CollisionNode("wall")
         wall_node.addSolid(wall_solid)
-        wall = self.render.attachNewNode(wall_node)
+        wall = self.scene.wallRoot.attachNewNode(wall_node)
         wall.setX(8.0)
 
         wall_solid = CollisionTube(0, -8.0, 0, 0, 8.0, 0, 0.2)
         wall_node = CollisionNode("wall")
         wall_node.addSolid(wall_solid)
-        wall = self.render.attachNewNode(wall_node)
+        wall = self.scene.wallRoot.attachNewNode(wall_node)
         wall.setX(-8.0)
 
+        self.scene.prepare()
+
+        # The player and the traps are pushed either by the pusher above or,
+        # with analytic-collisions set, as circles in the walls' 16x16 box
+        self.arena = None
+        if analytic_collisions.getValue():
+            self.arena = ArenaCollider(self.render, self.scene.wallRoot, 8.0, 0.2)
+            self.taskMgr.add(self.update_collisions, "arenaCollisions", sort=30)
+
+        self.startupTrace.mark("collisions")
+
+        # Dying enemies are always actors, so "die" isn't rendered
+        self.impostors = None
+        if impostors_enabled.getValue():
+            impostor_anims = {anim_name: anim_file for anim_name, anim_file in WalkingEnemy.modelAnims.items()
+                              if anim_name != "die"}
+            impostor_sheet = ImpostorSheet(WalkingEnemy.modelName, impostor_anims,
+                                           impostor_frames.getValue(), impostor_cell_size.getValue(), 1.0)
+            self.impostors = ImpostorRenderer(self.entities, impostor_sheet, self.scene.get_root("enemies"))
+            self.startupTrace.mark("impostors")
+
         self.player = None
 
         self.enemies = []
@@ -117,14 +186,22 @@ class Game(ShowBase):
         self.difficultyInterval = 5.0
         self.difficultyTimer = self.difficultyInterval
 
+        # Time spent updating animations in the last frame
+        self.animationTime = 0
+
         # GUI
-        button_images = (
-            self.loader.loadTexture("UI/UIButton.png"),
-            self.loader.loadTexture("UI/UIButtonPressed.png"),
-            self.loader.loadTexture("UI/UIButtonHighlighted.png"),
-            self.loader.loadTexture("UI/UIButtonDisabled.png")
-        )
+        # All UI images come from one texture; see BuildUIAtlas.py
+        self.uiAtlas = UIAtlas(self.loader)
+        self.startupTrace.mark("uiAtlas")
+
+        self.buttonImages = tuple(self.uiAtlas.make_card(image, (-4, 4, -1, 1)) for image in [
+            "UI/UIButton.png",
+            "UI/UIButtonPressed.png",
+            "UI/UIButtonHighlighted.png",
+            "UI/UIButtonDisabled.png"
+        ])
         self.font = self.loader.loadFont("Fonts/Wbxkomik.ttf")
+        self.clickSound = self.loader.loadSfx("Sounds/UIClick.ogg")
 
         self.titleMenuBackdrop = DirectFrame(frameColor=(0, 0, 0, 1),
                                              frameSize=(-1, 1, -1, 1),
@@ -156,11 +233,11 @@ class Game(ShowBase):
                                          parent=self.titleMenu,
                                          scale=0.1,
                                          text_font=self.font,
-                                         clickSound=self.loader.loadSfx("Sounds/UIClick.ogg"),
-                                         frameTexture=button_images,
+                                         clickSound=self.clickSound,
+                                         geom=self.buttonImages,
                                          frameSize=(-4, 4, -1, 1),
                                          text_scale=0.75,
-                                         relief=DGG.FLAT,
+                                         relief=None,
                                          text_pos=(0, -0.2))
         start_game_button.setTransparency(True)
         main_menu_quit_button = DirectButton(text="Quit",
@@ -169,18 +246,60 @@ class Game(ShowBase):
                                              parent=self.titleMenu,
                                              scale=0.1,
                                              text_font=self.font,
-                                             clickSound=self.loader.loadSfx("Sounds/UIClick.ogg"),
-                                             frameTexture=button_images,
+                                             clickSound=self.clickSound,
+                                             geom=self.buttonImages,
                                              frameSize=(-4, 4, -1, 1),
                                              text_scale=0.75,
-                                             relief=DGG.FLAT,
+                                             relief=None,
                                              text_pos=(0, -0.2))
         main_menu_quit_button.setTransparency(True)
 
+        self.startupTrace.mark("titleMenu")
+
+        self.gameOverScreen = None
+        self.finalScoreLabel = None
+        if not lazy_startup.getValue():
+            self.build_game_over_screen()
+            self.startupTrace.mark("gameOverScreen")
+
+        # SFX
+        self.music = None
+        if lazy_startup.getValue():
+            self.taskMgr.add(self.start_music, "startMusic", sort=60)
+        else:
+            self.start_music()
+            self.startupTrace.mark("music")
+
+        self.enemySpawnSound = self.loader.loadSfx("Sounds/enemySpawn.ogg")
+
+        self.pusher.add_in_pattern("%fn-into-%in")
+
+        self.accept("trapEnemy-into-wall", self.stop_trap)
+        self.accept("trapEnemy-into-trapEnemy", self.stop_trap)
+        self.accept("trapEnemy-into-player", self.trap_hits_something)
+        self.accept("trapEnemy-into-walkingEnemy", self.trap_hits_something)
+
+        self.exitFunc = self.exit_game
+
+        self.updateTask = self.taskMgr.add(self.update, "update")
+
+        # After igLoop, so that input latency runs until the frame is drawn
+        self.taskMgr.add(self.end_input_frame, "endInputFrame", sort=60)
+
+        # F9 captures profile-capture-frames updates into a collapsed-stack file
+        self.profiler = FrameProfiler(self)
+        self.profileOnStart = None
+        self.accept("f9", self.toggle_profiler)
+
+        self.startupTrace.mark("sounds")
+        self.taskMgr.add(self.first_frame, "firstFrame", sort=60)
+
+    def build_game_over_screen(self):
         self.gameOverScreen = DirectDialog(frameSize=(-0.7, 0.7, -0.7, 0.7),
                                            fadeScreen=0.4,
-                                           relief=DGG.FLAT,
-                                           frameTexture="UI/stoneFrame.png")
+                                           relief=None,
+                                           geom=self.uiAtlas.make_card("UI/stoneFrame.png",
+                                                                       (-0.7, 0.7, -0.7, 0.7)))
         self.gameOverScreen.hide()
 
         game_over_label = DirectLabel(text="Game Over!",
@@ -203,11 +322,11 @@ class Game(ShowBase):
                                       parent=self.gameOverScreen,
                                       scale=0.07,
                                       text_font=self.font,
-                                      clickSound=self.loader.loadSfx("Sounds/UIClick.ogg"),
-                                      frameTexture=button_images,
+                                      clickSound=self.clickSound,
+                                      geom=self.buttonImages,
                                       frameSize=(-4, 4, -1, 1),
                                       text_scale=0.75,
-                                      relief=DGG.FLAT,
+                                      relief=None,
                                       text_pos=(0, -0.2))
         restart_button.setTransparency(True)
 
@@ -217,41 +336,59 @@ class Game(ShowBase):
                                    parent=self.gameOverScreen,
                                    scale=0.07,
                                    text_font=self.font,
-                                   clickSound=self.loader.loadSfx("Sounds/UIClick.ogg"),
-                                   frameTexture=button_images,
+                                   clickSound=self.clickSound,
+                                   geom=self.buttonImages,
                                    frameSize=(-4, 4, -1, 1),
                                    text_scale=0.75,
-                                   relief=DGG.FLAT,
+                                   relief=None,
                                    text_pos=(0, -0.2))
         quit_button.setTransparency(True)
 
-        # SFX
-        music = self.loader.loadMusic("Music/battle-music.ogg")
-        music.setLoop(True)
-        music.setVolume(0.075)
-        music.play()
+    def show_game_over_screen(self):
+        if self.gameOverScreen is None:
+            self.build_game_over_screen()
 
-        self.enemySpawnSound = self.loader.loadSfx("Sounds/enemySpawn.ogg")
+        if self.gameOverScreen.isHidden():
+            self.gameOverScreen.show()
+            self.finalScoreLabel["text"] = "Final score: " + str(self.player.score)
+            self.finalScoreLabel.setText()
 
-        self.pusher.add_in_pattern("%fn-into-%in")
+            self.input.notify.info("Input latency: %.1fms on average over the last %d key edges" %
+                                   (self.input.average_latency() * 1000, len(self.input.latencies)))
 
-        self.accept("trapEnemy-into-wall", self.stop_trap)
-        self.accept("trapEnemy-into-trapEnemy", self.stop_trap)
-        self.accept("trapEnemy-into-player", self.trap_hits_something)
-        self.accept("trapEnemy-into-walkingEnemy", self.trap_hits_something)
+    def start_music(self, task=None):
+        # Started lazily, once the first frame is on screen
+        if task is not None and task.frame == 0:
+            return task.cont
 
-        self.exitFunc = self.cleanup
+        self.music = self.loader.loadMusic("Music/battle-music.ogg")
+        self.music.setLoop(True)
+        self.music.setVolume(0.075)
+        self.music.play()
 
-        self.updateTask = self.taskMgr.add(self.update, "update")
+        if task is not None:
+            return task.done
+
+    def first_frame(self, task):
+        self.startupTrace.mark("firstFrame")
+        self.startupTrace.notify.info("First frame after %.1fms" % (self.startupTrace.total() * 1000))
+        self.startupTrace.notify.debug("\n" + self.startupTrace.report())
+        return task.done
 
     def start_game(self):
         self.titleMenu.hide()
         self.titleMenuBackdrop.hide()
-        self.gameOverScreen.hide()
+        if self.gameOverScreen is not None:
+            self.gameOverScreen.hide()
 
         self.cleanup()
+        self.quality.reset()
         self.player = Player()
 
+        if self.profileOnStart is not None:
+            self.profiler.start(*self.profileOnStart)
+            self.profileOnStart = None
+
         self.maxEnemies = 2
         self.spawnInterval = self.initialSpawnInterval
         self.difficultyTimer = self.difficultyInterval
@@ -291,7 +428,12 @@ class Game(ShowBase):
             trap.moveInX = True
             self.trapEnemies.append(trap)
 
+    def toggle_profiler(self, time=None):
+        self.profiler.toggle()
+
     def cleanup(self):
+        self.enemyAI.reset()
+
         for enemy in self.enemies:
             enemy.cleanup()
         self.enemies = []
@@ -308,8 +450,18 @@ class Game(ShowBase):
             self.player.cleanup()
             self.player = None
 
-    def quit(self):
+        if self.impostors is not None:
+            self.impostors.clear()
+
+    def exit_game(self):
         self.cleanup()
+        self.enemyAI.cleanup()
+        self.lights.cleanup()
+
+        if self.impostors is not None:
+            self.impostors.cleanup()
+
+    def quit(self):
         base.userExit()
 
     def spawn_enemy(self):
@@ -317,7 +469,7 @@ class Game(ShowBase):
             spawn_point = random.choice(self.spawnPoints)
             new_enemy = WalkingEnemy(spawn_point)
             self.enemies.append(new_enemy)
-            self.enemySpawnSound.play()
+            self.quality.play_sound(self.enemySpawnSound)
 
     def stop_trap(self, entry):
         collider = entry.getFromNodePath()
@@ -326,7 +478,7 @@ class Game(ShowBase):
             trap.moveDirection = 0
             trap.ignorePlayer = False
             trap.movementSound.stop()
-            trap.stopSound.play()
+            self.quality.play_sound(trap.stopSound)
 
     def trap_hits_something(self, entry):
         collider = entry.getFromNodePath()
@@ -346,17 +498,57 @@ class Game(ShowBase):
                 else:
                     obj.alter_health(-10)
 
-                trap.impactSound.play()
+                self.quality.play_sound(trap.impactSound)
 
-    def update_key_map(self, control_name, control_state):
-        self.keyMap[control_name] = control_state
+    def add_collider(self, collider, mover=None):
+        if self.arena is not None:
+            self.arena.add(collider, mover)
+        elif mover is not None:
+            self.pusher.addCollider(collider, mover)
+            self.cTrav.addCollider(collider, self.pusher)
+
+    def remove_collider(self, collider):
+        if self.arena is not None:
+            self.arena.remove(collider)
+        self.cTrav.removeCollider(collider)
+        self.pusher.removeCollider(collider)
+
+    def update_collisions(self, task):
+        self.arena.update()
+        return task.cont
+
+    def count_ui_draw_calls(self):
+        return count_draw_calls(self.render2d)
+
+    def update_key_map(self, control_name, control_state, time=None):
+        self.input.record(control_name, control_state, time)
+
+    def end_input_frame(self, task):
+        self.input.end_frame()
+        return task.cont
+
+    def update_animations(self, dt):
+        start = time.perf_counter()
+
+        self.entities.update_animations(dt)
+
+        self.animationTime = time.perf_counter() - start
 
     def update(self, task):
         dt = globalClock.getDt()
 
+        self.input.begin_frame(dt)
+        self.input.sample_mouse(self.mouseWatcherNode)
+
+        self.quality.update(dt)
+        self.lights.update()
+
         if self.player is not None:
             if self.player.health > 0:
-                self.player.update(self.keyMap, dt)
+                # Move everything, then let the player and the AI react
+                self.entities.update_kinematics(dt)
+
+                self.player.update(self.input, dt)
 
                 # Wait to spawn an enemy...
                 self.spawnTimer -= dt
@@ -366,8 +558,11 @@ class Game(ShowBase):
                     self.spawn_enemy()
 
                 # Update all enemies and traps
-                [enemy.update(self.player, dt) for enemy in self.enemies]
-                [trap.update(self.player, dt) for trap in self.trapEnemies]
+                player_pos = self.player.actor.getPos()
+                self.enemyAI.update(player_pos, dt)
+                crowd_ranks = self.entities.update_animation_states(player_pos)
+                if self.impostors is not None:
+                    self.impostors.update(player_pos, crowd_ranks)
 
                 # Find the enemies that have just
                 # died, if any
@@ -380,8 +575,7 @@ class Game(ShowBase):
                 # and should play their "die" animation.
                 # In addition, increase the player's score.
                 for enemy in newly_dead_enemies:
-                    enemy.collider.removeNode()
-                    enemy.actor.play("die")
+                    enemy.die()
                     self.player.score += enemy.scoreValue
                 if len(newly_dead_enemies) > 0:
                     self.player.update_score()
@@ -394,13 +588,14 @@ class Game(ShowBase):
                 # and drop them from the "dead enemies" list.
                 enemies_animating_deaths = []
                 for enemy in self.deadEnemies:
-                    death_anim_control = enemy.actor.getAnimControl("die")
-                    if death_anim_control is None or not death_anim_control.isPlaying():
+                    if not enemy.animator.is_playing("die"):
                         enemy.cleanup()
                     else:
                         enemies_animating_deaths.append(enemy)
                 self.deadEnemies = enemies_animating_deaths
 
+                self.update_animations(dt)
+
                 # Make the game more difficult over time!
                 self.difficultyTimer -= dt
                 if self.difficultyTimer <= 0:
@@ -410,13 +605,24 @@ class Game(ShowBase):
                     if self.spawnInterval > self.minimumSpawnInterval:
                         self.spawnInterval -= 0.1
             else:
-                if self.gameOverScreen.isHidden():
-                    self.gameOverScreen.show()
-                    self.finalScoreLabel["text"] = "Final score: " + str(self.player.score)
-                    self.finalScoreLabel.setText()
+                self.show_game_over_screen()
 
         return task.cont
 
 
-game = Game()
-game.run()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", type=int, metavar="FRAMES",
+                        help="profile the first FRAMES updates of the first game")
+    parser.add_argument("--profile-output", help="collapsed-stack file to write the profile to")
+    parser.add_argument("--profile-split-frames", action="store_true",
+                        help="root each profiled stack at its frame rather than merging all frames")
+    args = parser.parse_args()
+
+    if args.profile_split_frames:
+        loadPrcFileData("profile", "profile-split-frames true")
+
+    game = Game()
+    if args.profile is not None:
+        game.profileOnStart = (args.profile, args.profile_output)
+    game.run()
@@ -1,65 +1,82 @@
 import math
 import random
+from collections import namedtuple
 
 from direct.actor.Actor import Actor
-from direct.gui.OnscreenImage import OnscreenImage
 from direct.gui.OnscreenText import OnscreenText
 from panda3d.core import AudioSound
 from panda3d.core import BitMask32
 from panda3d.core import CollisionRay, CollisionHandlerQueue
 from panda3d.core import CollisionSegment
 from panda3d.core import CollisionSphere, CollisionNode
-from panda3d.core import Plane, Point3
-from panda3d.core import PointLight
 from panda3d.core import TextNode
 from panda3d.core import Vec3, Vec2, Vec4
 
-FRICTION = 150.0
+from Animator import Animator
+from Entities import Audio, ChaserAI, ChaserStats, Kinematics, TrapAI, Transform, Vitals
+from Entities import component_property
+from QualityController import BEAM_HIT_LIGHT, EFFECT_MODELS
+from UIAtlas import HealthBar
 
+# Data that never changes is created once and shared by every instance:
+# collision nodes hold a reference to the solid, and masks are copied
+# into the nodes that use them.
+COLLIDER_SOLID = CollisionSphere(0, 0, 0, 0.3)
+NO_MASK = BitMask32()
+PLAYER_MASK = BitMask32.bit(1)
+ENEMY_MASK = BitMask32.bit(2)
+TRAP_MASK = PLAYER_MASK | ENEMY_MASK
+Y_VECTOR = Vec2(0, 1)
 
+Stats = namedtuple("Stats", ["maxHealth", "maxSpeed", "acceleration"])
+
+
+# The game objects are facades over the components in base.entities;
+# movement, AI and animation state are updated in bulk by its systems.
 class GameObject:
-    def __init__(self, pos, model_name, model_anims, max_health, max_speed, collider_name):
-        self.actor = Actor(model_name, model_anims)
-        self.actor.reparentTo(render)
-        self.actor.setPos(pos)
+    sceneGroup = None
 
-        self.maxHealth = max_health
-        self.health = max_health
+    health = component_property("vitals", "health")
+    maxHealth = component_property("vitals", "maxHealth")
 
-        self.maxSpeed = max_speed
+    velocity = component_property("kinematics", "velocity")
+    maxSpeed = component_property("kinematics", "maxSpeed")
+    acceleration = component_property("kinematics", "acceleration")
+    walking = component_property("kinematics", "walking")
 
-        self.velocity = Vec3(0, 0, 0)
-        self.acceleration = 300.0
+    deathSound = component_property("audio", "deathSound")
 
-        self.walking = False
+    stats = None
 
-        collider_node = CollisionNode(collider_name)
-        collider_node.addSolid(CollisionSphere(0, 0, 0, 0.3))
-        self.collider = self.actor.attachNewNode(collider_node)
-        self.collider.setPythonTag("owner", self)
+    # Sound files of a type, by Audio attribute. The loader caches the
+    # sound data, but each instance gets its own handles so that the
+    # sounds of several instances can play at once.
+    soundFiles = {}
 
-        # SFX
-        self.deathSound = None
+    def __init__(self, pos, model_name, model_anims, collider_name):
+        self.actor = Actor(model_name, model_anims)
+        self.actor.reparentTo(base.scene.get_root(self.sceneGroup))
+        self.actor.setPos(pos)
 
-    def update(self, dt):
-        speed = self.velocity.length()
-        if speed > self.maxSpeed:
-            self.velocity.normalize()
-            self.velocity *= self.maxSpeed
-            speed = self.maxSpeed
+        self.transform = Transform(self.actor)
+        self.kinematics = Kinematics(self.stats.maxSpeed, self.stats.acceleration)
+        self.vitals = Vitals(self.stats.maxHealth)
+        self.audio = Audio()
+        self.animator = Animator(self.actor, model_anims.keys())
 
-        if not self.walking:
-            friction_val = FRICTION * dt
-            if friction_val > speed:
-                self.velocity.set(0, 0, 0)
-            else:
-                friction_vec = -self.velocity
-                friction_vec.normalize()
-                friction_vec *= friction_val
+        for sound_name, file_name in self.soundFiles.items():
+            setattr(self.audio, sound_name, loader.loadSfx(file_name))
 
-                self.velocity += friction_vec
+        self.entity = base.entities.create(self.transform,
+                                           self.kinematics,
+                                           self.vitals,
+                                           self.audio,
+                                           self.animator)
 
-        self.actor.setPos(self.actor.getPos() + self.velocity * dt)
+        collider_node = CollisionNode(collider_name)
+        collider_node.addSolid(COLLIDER_SOLID)
+        self.collider = self.actor.attachNewNode(collider_node)
+        self.collider.setPythonTag("owner", self)
 
     def alter_health(self, d_health):
         previous_health = self.health
@@ -69,23 +86,34 @@ class GameObject:
             self.health = self.maxHealth
 
         if previous_health > 0 and self.health <= 0 and self.deathSound is not None:
-            self.deathSound.play()
+            base.quality.play_sound(self.deathSound)
 
     def cleanup(self):
+        base.entities.destroy(self.entity)
+
         if self.collider is not None and not self.collider.isEmpty():
             self.collider.clearPythonTag("owner")
-            base.cTrav.removeCollider(self.collider)
-            base.pusher.removeCollider(self.collider)
+            base.remove_collider(self.collider)
 
         if self.actor is not None:
             self.actor.cleanup()
             self.actor.removeNode()
             self.actor = None
 
+        self.animator = None
         self.collider = None
 
 
 class Player(GameObject):
+    sceneGroup = "player"
+
+    hurtSound = component_property("audio", "hurtSound")
+
+    stats = Stats(maxHealth=5, maxSpeed=10, acceleration=300.0)
+    soundFiles = {
+        "hurtSound": "Sounds/FemaleDmgNoise.ogg"
+    }
+
     def __init__(self):
         GameObject.__init__(self,
                             Vec3(0, 0, 0),
@@ -94,43 +122,29 @@ class Player(GameObject):
                                 "stand": "Models/PandaChan/a_p3d_chan_idle",
                                 "walk": "Models/PandaChan/a_p3d_chan_run"
                             },
-                            5,
-                            10,
                             "player")
 
         self.actor.getChild(0).setH(180)
-        self.actor.loop("stand")
+        self.animator.loop("stand")
 
         # Collision Detection
-        base.pusher.addCollider(self.collider, self.actor)
-        base.cTrav.addCollider(self.collider, base.pusher)
-
-        mask = BitMask32()
-        mask.setBit(1)
-
-        self.collider.node().setIntoCollideMask(mask)
+        self.collider.node().setIntoCollideMask(PLAYER_MASK)
+        self.collider.node().setFromCollideMask(PLAYER_MASK)
 
-        mask = BitMask32()
-        mask.setBit(1)
-
-        self.collider.node().setFromCollideMask(mask)
+        base.add_collider(self.collider, self.actor)
 
         # Laser attack
         self.ray = CollisionRay(0, 0, 0, 0, 1, 0)
         ray_node = CollisionNode("playerRay")
         ray_node.addSolid(self.ray)
 
-        self.rayNodePath = render.attachNewNode(ray_node)
+        self.rayNodePath = base.scene.colliderRoot.attachNewNode(ray_node)
         self.rayQueue = CollisionHandlerQueue()
 
         base.cTrav.addCollider(self.rayNodePath, self.rayQueue)
 
-        mask = BitMask32()
-        mask.setBit(2)
-        ray_node.setFromCollideMask(mask)
-
-        mask = BitMask32()
-        ray_node.setIntoCollideMask(mask)
+        ray_node.setFromCollideMask(ENEMY_MASK)
+        ray_node.setIntoCollideMask(NO_MASK)
 
         self.damagePerSecond = -5.0
 
@@ -142,7 +156,7 @@ class Player(GameObject):
 
         # Enemy Hit fx
         self.beamHitModel = loader.loadModel("Models/BambooLaser/bambooLaserHit")
-        self.beamHitModel.reparentTo(render)
+        self.beamHitModel.reparentTo(base.scene.get_root("effects"))
         self.beamHitModel.setZ(1.5)
         self.beamHitModel.setLightOff()
         self.beamHitModel.hide()
@@ -150,10 +164,8 @@ class Player(GameObject):
         self.beamHitPulseRate = 0.15
         self.beamHitTimer = 0
 
-        self.beamHitLight = PointLight("beamHitLight")
-        self.beamHitLight.setColor(Vec4(0.1, 1.0, 0.2, 1))
-        self.beamHitLight.setAttenuation((1.0, 0.1, 0.5))
-        self.beamHitLightNodePath = render.attachNewNode(self.beamHitLight)
+        # May be None if the dynamic light budget is used up
+        self.beamHitLight = base.lights.acquire(Vec4(0.1, 1.0, 0.2, 1), (1.0, 0.1, 0.5))
 
         # Player hit fx
         self.damageTakenModel = loader.loadModel("Models/BambooLaser/playerHit.egg")
@@ -165,11 +177,6 @@ class Player(GameObject):
         self.damageTakenModelTimer = 0
         self.damageTakenModelDuration = 0.15
 
-        # Mouse attack variables
-        self.lastMousePos = Vec2(0, 0)
-        self.groundPlane = Plane(Vec3(0, 0, 1), Vec3(0, 0, 0))
-        self.yVector = Vec2(0, 1)
-
         # Player UI
         self.score = 0
         self.scoreUI = OnscreenText(text="0",
@@ -178,13 +185,12 @@ class Player(GameObject):
                                     align=TextNode.ALeft,
                                     font=base.font)
 
-        self.healthIcons = []
-        for i in range(self.maxHealth):
-            icon = OnscreenImage(image="UI/health.png",
-                                 pos=(-1.275 + i * 0.075, 0, 0.95),
-                                 scale=0.04)
-            icon.setTransparency(True)
-            self.healthIcons.append(icon)
+        self.healthBar = HealthBar(base.uiAtlas,
+                                   self.maxHealth,
+                                   pos=(-1.275, 0, 0.95),
+                                   spacing=0.075,
+                                   scale=0.04,
+                                   parent=base.aspect2d)
 
         # SFX
         self.laserSoundNoHit = loader.loadSfx("Sounds/laserNoHit.ogg")
@@ -192,53 +198,32 @@ class Player(GameObject):
         self.laserSoundHit = loader.loadSfx("Sounds/laserHit.ogg")
         self.laserSoundHit.setLoop(True)
 
-        self.hurtSound = loader.loadSfx("Sounds/FemaleDmgNoise.ogg")
-
     def update_score(self):
         self.scoreUI.setText(str(self.score))
 
     def alter_health(self, d_health):
         GameObject.alter_health(self, d_health)
-        self.damageTakenModel.show()
+        if base.quality.is_enabled(EFFECT_MODELS):
+            self.damageTakenModel.show()
         self.damageTakenModel.setH(random.uniform(0.0, 360.0))
         self.damageTakenModelTimer = self.damageTakenModelDuration
         self.update_health_ui()
         self.hurtSound.play()
 
     def update_health_ui(self):
-        for index, icon in enumerate(self.healthIcons):
-            if index < self.health:
-                icon.show()
-            else:
-                icon.hide()
-
-    def update(self, keys, dt):
-        GameObject.update(self, dt)
+        self.healthBar.set_value(self.health)
 
+    def update(self, controls, dt):
         self.walking = False
 
-        mouse_watcher = base.mouseWatcherNode
-        if mouse_watcher.hasMouse():
-            mouse_pos = mouse_watcher.getMouse()
-        else:
-            mouse_pos = self.lastMousePos
-
-        mouse_pos_3d = Point3()
-        near_point = Point3()
-        far_point = Point3()
-
-        base.camLens.extrude(mouse_pos, near_point, far_point)
-
-        self.groundPlane.intersectsLine(mouse_pos_3d,
-                                        render.getRelativePoint(base.camera, near_point),
-                                        render.getRelativePoint(base.camera, far_point))
+        mouse_pos_3d = base.groundAim.project(controls.mousePos)
 
         firing_vector = Vec3(mouse_pos_3d - self.actor.getPos())
         firing_vector_2d = firing_vector.getXy()
         firing_vector_2d.normalize()
         firing_vector.normalize()
 
-        heading = self.yVector.signedAngleDeg(firing_vector_2d)
+        heading = Y_VECTOR.signedAngleDeg(firing_vector_2d)
 
         self.actor.setH(heading)
 
@@ -250,9 +235,8 @@ class Player(GameObject):
         if self.beamHitTimer <= 0:
             self.beamHitTimer = self.beamHitPulseRate
             self.beamHitModel.setH(random.uniform(0.0, 360.0))
-        self.beamHitModel.setScale(math.sin(self.beamHitTimer * 3.142 / self.beamHitPulseRate) * 0.4 + 0.9)
-
-        self.lastMousePos = mouse_pos
+        beam_hit_pulse = math.sin(self.beamHitTimer * 3.142 / self.beamHitPulseRate) * 0.4 + 0.9
+        self.beamHitModel.setScale(beam_hit_pulse)
 
         if self.damageTakenModelTimer > 0:
             self.damageTakenModelTimer -= dt
@@ -260,19 +244,20 @@ class Player(GameObject):
             if self.damageTakenModelTimer <= 0:
                 self.damageTakenModel.hide()
 
-        if keys["up"]:
+        # Accelerate only for the part of the frame each key was held
+        up_time = controls.held_time("up")
+        down_time = controls.held_time("down")
+        left_time = controls.held_time("left")
+        right_time = controls.held_time("right")
+        if up_time + down_time + left_time + right_time > 0:
             self.walking = True
-            self.velocity.addY(self.acceleration * dt)
-        if keys["down"]:
-            self.walking = True
-            self.velocity.addY(-self.acceleration * dt)
-        if keys["left"]:
-            self.walking = True
-            self.velocity.addX(-self.acceleration * dt)
-        if keys["right"]:
-            self.walking = True
-            self.velocity.addX(self.acceleration * dt)
-        if keys["shoot"]:
+            self.velocity.addY(self.acceleration * (up_time - down_time))
+            self.velocity.addX(self.acceleration * (right_time - left_time))
+        # Stepping the light down removes it from the scene's lights
+        if self.beamHitLight is not None:
+            base.lights.set_attached(self.beamHitLight, base.quality.is_enabled(BEAM_HIT_LIGHT))
+
+        if controls.is_active("shoot"):
             if self.rayQueue.getNumEntries() > 0:
                 scored_hit = False
 
@@ -284,7 +269,7 @@ class Player(GameObject):
                 if hit_node_path.hasPythonTag("owner"):
                     hit_object = hit_node_path.getPythonTag("owner")
                     if not isinstance(hit_object, TrapEnemy):
-                        hit_object.alter_health(self.damagePerSecond * dt)
+                        hit_object.alter_health(self.damagePerSecond * controls.held_time("shoot"))
                         scored_hit = True
 
                 beam_length = (hit_pos - self.actor.getPos()).length()
@@ -298,21 +283,24 @@ class Player(GameObject):
                     if self.laserSoundHit.status() != AudioSound.PLAYING:
                         self.laserSoundHit.play()
 
-                    self.beamHitModel.show()
+                    if base.quality.is_enabled(EFFECT_MODELS):
+                        self.beamHitModel.show()
+                    else:
+                        self.beamHitModel.hide()
 
                     self.beamHitModel.setPos(hit_pos)
-                    self.beamHitLightNodePath.setPos(hit_pos + Vec3(0, 0, 0.5))
 
-                    if not render.hasLight(self.beamHitLightNodePath):
-                        render.setLight(self.beamHitLightNodePath)
+                    if self.beamHitLight is not None:
+                        self.beamHitLight.set_pos(hit_pos + Vec3(0, 0, 0.5))
+                        self.beamHitLight.set_intensity(beam_hit_pulse)
                 else:
                     if self.laserSoundHit.status() == AudioSound.PLAYING:
                         self.laserSoundHit.stop()
                     if self.laserSoundNoHit.status() != AudioSound.PLAYING:
                         self.laserSoundNoHit.play()
 
-                    if render.hasLight(self.beamHitLightNodePath):
-                        render.clearLight(self.beamHitLightNodePath)
+                    if self.beamHitLight is not None:
+                        self.beamHitLight.turn_off()
 
                     self.beamHitModel.hide()
         else:
@@ -321,36 +309,21 @@ class Player(GameObject):
             if self.laserSoundHit.status() == AudioSound.PLAYING:
                 self.laserSoundHit.stop()
 
-            if render.hasLight(self.beamHitLightNodePath):
-                render.clearLight(self.beamHitLightNodePath)
+            if self.beamHitLight is not None:
+                self.beamHitLight.turn_off()
 
             self.beamModel.hide()
             self.beamHitModel.hide()
 
-        if self.walking:
-            stand_control = self.actor.getAnimControl("stand")
-            if stand_control.isPlaying():
-                stand_control.stop()
-
-            walk_control = self.actor.getAnimControl("walk")
-            if not walk_control.isPlaying():
-                self.actor.loop("walk")
-        else:
-            stand_control = self.actor.getAnimControl("stand")
-            if not stand_control.isPlaying():
-                self.actor.stop("walk")
-                self.actor.loop("stand")
-
     def cleanup(self):
         base.cTrav.removeCollider(self.rayNodePath)
 
         self.scoreUI.removeNode()
-        for icon in self.healthIcons:
-            icon.removeNode()
+        self.healthBar.cleanup()
 
         self.beamHitModel.removeNode()
-        render.clearLight(self.beamHitLightNodePath)
-        self.beamHitLightNodePath.removeNode()
+        base.lights.release(self.beamHitLight)
+        self.beamHitLight = None
         GameObject.cleanup(self)
 
         self.laserSoundHit.stop()
@@ -358,133 +331,69 @@ class Player(GameObject):
 
 
 class Enemy(GameObject):
-    def __init__(self, pos, model_name, model_anims, max_health, max_speed, collider_name):
-        GameObject.__init__(self, pos, model_name, model_anims, max_health, max_speed, collider_name)
-        self.scoreValue = 1
+    scoreValue = 1
 
-    def update(self, player, dt):
-        GameObject.update(self, dt)
+    def die(self):
+        # Dead enemies only finish their animation
+        base.entities.remove(self.entity, Kinematics)
+        base.entities.remove(self.entity, ChaserAI)
+        base.entities.remove(self.entity, TrapAI)
 
-        self.run_logic(player, dt)
-
-        if self.walking:
-            walking_control = self.actor.getAnimControl("walk")
-            if not walking_control.isPlaying():
-                self.actor.loop("walk")
-        else:
-            spawn_control = self.actor.getAnimControl("spawn")
-            if spawn_control is None or not spawn_control.isPlaying():
-                attack_control = self.actor.getAnimControl("attack")
-                if attack_control is None or not attack_control.isPlaying():
-                    stand_control = self.actor.getAnimControl("stand")
-                    if not stand_control.isPlaying():
-                        self.actor.loop("stand")
-
-    def run_logic(self, player, dt):
-        pass
+        base.remove_collider(self.collider)
+        self.collider.removeNode()
+        self.animator.play("die")
 
 
 class WalkingEnemy(Enemy):
+    sceneGroup = "enemies"
+
+    # Also rendered into the impostor sheet; see Impostors.py
+    modelName = "Models/SimpleEnemy/simpleEnemy"
+    modelAnims = {
+        "stand": "Models/SimpleEnemy/simpleEnemy-stand",
+        "walk": "Models/SimpleEnemy/simpleEnemy-walk",
+        "attack": "Models/SimpleEnemy/simpleEnemy-attack",
+        "die": "Models/SimpleEnemy/simpleEnemy-die",
+        "spawn": "Models/SimpleEnemy/simpleEnemy-spawn"
+    }
+
+    stats = Stats(maxHealth=3.0, maxSpeed=7.0, acceleration=100.0)
+    attackStats = ChaserStats(attackDistance=0.75, attackDamage=-1, attackDelay=0.3)
+    soundFiles = {
+        "deathSound": "Sounds/enemyDie.ogg",
+        "attackSound": "Sounds/enemyAttack.ogg"
+    }
+
     def __init__(self, pos):
         Enemy.__init__(self, pos,
-                       "Models/SimpleEnemy/simpleEnemy",
-                       {
-                           "stand": "Models/SimpleEnemy/simpleEnemy-stand",
-                           "walk": "Models/SimpleEnemy/simpleEnemy-walk",
-                           "attack": "Models/SimpleEnemy/simpleEnemy-attack",
-                           "die": "Models/SimpleEnemy/simpleEnemy-die",
-                           "spawn": "Models/SimpleEnemy/simpleEnemy-spawn"
-                       },
-                       3.0,
-                       7.0,
+                       self.modelName,
+                       self.modelAnims,
                        "walkingEnemy")
 
-        self.deathSound = loader.loadSfx("Sounds/enemyDie.ogg")
-        self.attackSound = loader.loadSfx("Sounds/enemyAttack.ogg")
+        self.collider.node().setIntoCollideMask(ENEMY_MASK)
 
-        self.attackDistance = 0.75
-        self.acceleration = 100.0
-        self.yVector = Vec2(0, 1)
+        # Traps are pushed away from walking enemies
+        base.add_collider(self.collider)
 
-        mask = BitMask32()
-        mask.setBit(2)
-
-        self.collider.node().setIntoCollideMask(mask)
-
-        self.attackSegment = CollisionSegment(0, 0, 0, 1, 0, 0)
+        attack_segment = CollisionSegment(0, 0, 0, 1, 0, 0)
         segment_node = CollisionNode("enemyAttackSegment")
-        segment_node.addSolid(self.attackSegment)
-
-        mask = BitMask32()
-        mask.setBit(1)
-        segment_node.setFromCollideMask(mask)
-
-        mask = BitMask32()
-        segment_node.setIntoCollideMask(mask)
+        segment_node.addSolid(attack_segment)
 
-        self.attackSegmentNodePath = render.attachNewNode(segment_node)
-        self.segmentQueue = CollisionHandlerQueue()
+        segment_node.setFromCollideMask(PLAYER_MASK)
+        segment_node.setIntoCollideMask(NO_MASK)
 
-        base.cTrav.addCollider(self.attackSegmentNodePath, self.segmentQueue)
+        self.attackSegmentNodePath = base.scene.colliderRoot.attachNewNode(segment_node)
 
-        self.attackDamage = -1
+        segment_queue = CollisionHandlerQueue()
 
-        self.attackDelay = 0.3
-        self.attackDelayTimer = 0
-        self.attackWaitTimer = 0
+        base.cTrav.addCollider(self.attackSegmentNodePath, segment_queue)
 
-        self.actor.play("spawn")
-        spawn_control = self.actor.getAnimControl("spawn")
-        if spawn_control is not None and spawn_control.isPlaying():
-            return
+        self.ai = ChaserAI(self.attackStats,
+                           attack_segment=attack_segment,
+                           segment_queue=segment_queue)
+        base.entities.add(self.entity, self.ai)
 
-    def run_logic(self, player, dt):
-        vector_to_player = player.actor.getPos() - self.actor.getPos()
-
-        vector_to_player_2d = vector_to_player.getXy()
-        distance_to_player = vector_to_player_2d.length()
-
-        vector_to_player_2d.normalize()
-
-        heading = self.yVector.signedAngleDeg(vector_to_player_2d)
-
-        if distance_to_player > self.attackDistance * 0.9:
-            attack_control = self.actor.getAnimControl("attack")
-            if not attack_control.isPlaying():
-                self.walking = True
-                vector_to_player.setZ(0)
-                vector_to_player.normalize()
-                self.velocity += vector_to_player * self.acceleration * dt
-                self.attackWaitTimer = 0.2
-                self.attackDelayTimer = 0
-        else:
-            self.walking = False
-            self.velocity.set(0, 0, 0)
-
-            if self.attackDelayTimer > 0:
-                self.attackDelayTimer -= dt
-                if self.attackDelayTimer <= 0:
-                    if self.segmentQueue.getNumEntries() > 0:
-                        self.segmentQueue.sortEntries()
-                        segment_hit = self.segmentQueue.getEntry(0)
-
-                        hit_node_path = segment_hit.getIntoNodePath()
-                        if hit_node_path.hasPythonTag("owner"):
-                            hit_object = hit_node_path.getPythonTag("owner")
-                            hit_object.alter_health(self.attackDamage)
-                            self.attackWaitTimer = 1.0
-            elif self.attackWaitTimer > 0:
-                self.attackWaitTimer -= dt
-                if self.attackWaitTimer <= 0:
-                    self.attackWaitTimer = random.uniform(0.5, 0.7)
-                    self.attackDelayTimer = self.attackDelay
-                    self.actor.play("attack")
-                    self.attackSound.play()
-
-        self.actor.setH(heading)
-
-        self.attackSegment.setPointA(self.actor.getPos())
-        self.attackSegment.setPointB(self.actor.getPos() + self.actor.getQuat().getForward() * self.attackDistance)
+        self.animator.play("spawn")
 
     def alter_health(self, d_health):
         Enemy.alter_health(self, d_health)
@@ -504,6 +413,23 @@ class WalkingEnemy(Enemy):
 
 
 class TrapEnemy(Enemy):
+    sceneGroup = "traps"
+
+    moveInX = component_property("ai", "moveInX")
+    moveDirection = component_property("ai", "moveDirection")
+    ignorePlayer = component_property("ai", "ignorePlayer")
+
+    impactSound = component_property("audio", "impactSound")
+    stopSound = component_property("audio", "stopSound")
+    movementSound = component_property("audio", "movementSound")
+
+    stats = Stats(maxHealth=100.0, maxSpeed=10.0, acceleration=300.0)
+    soundFiles = {
+        "impactSound": "Sounds/trapHitsSomething.ogg",
+        "stopSound": "Sounds/trapStop.ogg",
+        "movementSound": "Sounds/trapSlide.ogg"
+    }
+
     def __init__(self, pos):
         Enemy.__init__(self, pos,
                        "Models/SlidingTrap/trap",
@@ -511,58 +437,20 @@ class TrapEnemy(Enemy):
                            "stand": "Models/SlidingTrap/trap-stand",
                            "walk": "Models/SlidingTrap/trap-walk"
                        },
-                       100.0,
-                       10.0,
                        "trapEnemy")
 
-        base.pusher.addCollider(self.collider, self.actor)
-        base.cTrav.addCollider(self.collider, base.pusher)
+        self.ai = TrapAI()
+        base.entities.add(self.entity, self.ai)
 
-        self.moveInX = False
+        self.collider.node().setIntoCollideMask(TRAP_MASK)
+        self.collider.node().setFromCollideMask(TRAP_MASK)
 
-        self.moveDirection = 0
-
-        self.ignorePlayer = False
-
-        mask = BitMask32()
-        mask.setBit(2)
-        mask.setBit(1)
-
-        self.collider.node().setIntoCollideMask(mask)
-
-        mask = BitMask32()
-        mask.setBit(2)
-        mask.setBit(1)
-
-        self.collider.node().setFromCollideMask(mask)
+        base.add_collider(self.collider, self.actor)
 
         # SFX
-        self.impactSound = loader.loadSfx("Sounds/trapHitsSomething.ogg")
-        self.stopSound = loader.loadSfx("Sounds/trapStop.ogg")
-        self.movementSound = loader.loadSfx("Sounds/trapSlide.ogg")
+        # The slide loops until this trap stops
         self.movementSound.setLoop(True)
 
-    def run_logic(self, player, dt):
-        if self.moveDirection != 0:
-            self.walking = True
-            if self.moveInX:
-                self.velocity.addX(self.moveDirection * self.acceleration * dt)
-            else:
-                self.velocity.addY(self.moveDirection * self.acceleration * dt)
-        else:
-            self.walking = False
-            diff = player.actor.getPos() - self.actor.getPos()
-            if self.moveInX:
-                detector = diff.y
-                movement = diff.x
-            else:
-                detector = diff.x
-                movement = diff.y
-
-            if abs(detector) < 0.5:
-                self.moveDirection = math.copysign(1, movement)
-                self.movementSound.play()
-
     def cleanup(self):
         self.movementSound.stop()
         Enemy.cleanup(self)
@@ -0,0 +1,238 @@
+import math
+
+from direct.actor.Actor import Actor
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import AmbientLight
+from panda3d.core import ConfigVariableBool, ConfigVariableDouble, ConfigVariableInt
+from panda3d.core import DirectionalLight
+from panda3d.core import FrameBufferProperties
+from panda3d.core import Geom, GeomNode, GeomTriangles
+from panda3d.core import GeomVertexData, GeomVertexFormat, GeomVertexWriter
+from panda3d.core import NodePath
+from panda3d.core import OrthographicLens
+from panda3d.core import PNMImage
+from panda3d.core import Texture
+from panda3d.core import Vec4
+
+from Animator import Animator
+from Entities import ChaserAI, Transform, Vitals
+
+# Chasers beyond the nearest impostor-count, or further than
+# impostor-distance from the player, are drawn as flat cards cut from one
+# pre-rendered sprite sheet instead of as skinned actors.
+impostors_enabled = ConfigVariableBool("impostors", False)
+impostor_count = ConfigVariableInt("impostor-count", 12)
+impostor_distance = ConfigVariableDouble("impostor-distance", 6.0)
+impostor_frames = ConfigVariableInt("impostor-frames", 8)
+impostor_cell_size = ConfigVariableInt("impostor-cell-size", 128)
+
+# Enemies have to come this much closer than impostor-distance before
+# they become actors again, so that they don't flicker at the boundary.
+SWAP_MARGIN = 0.5
+
+# Cards are drawn at this height, about the middle of the model
+CARD_HEIGHT = 0.75
+
+
+class ImpostorSheet:
+    notify = directNotify.newCategory("ImpostorSheet")
+
+    def __init__(self, model_name, model_anims, frames, cell_size, extent):
+        self.animNames = list(model_anims.keys())
+        self.frames = frames
+        self.extent = extent
+
+        texture = Texture()
+        properties = FrameBufferProperties()
+        properties.setRgbColor(True)
+        properties.setRgbaBits(8, 8, 8, 8)
+        properties.setDepthBits(16)
+        buffer = base.win.makeTextureBuffer("impostorBake", cell_size, cell_size, texture, True, properties)
+        buffer.setClearColor(Vec4(0, 0, 0, 0))
+
+        # Lit the same way as the game, seen from straight above as the
+        # game's camera sees it
+        scene = NodePath("impostorBake")
+
+        ambient_light = AmbientLight("ambient light")
+        ambient_light.setColor(Vec4(0.2, 0.2, 0.2, 1))
+        scene.setLight(scene.attachNewNode(ambient_light))
+
+        main_light = scene.attachNewNode(DirectionalLight("main light"))
+        main_light.setHpr(45, -45, 0)
+        scene.setLight(main_light)
+
+        scene.setShaderAuto()
+
+        lens = OrthographicLens()
+        lens.setFilmSize(extent * 2, extent * 2)
+        lens.setNearFar(1, 64)
+
+        camera = base.makeCamera(buffer, scene=scene, lens=lens, camName="impostorCamera")
+        camera.reparentTo(scene)
+        camera.setPos(0, 0, 32)
+        camera.setP(-90)
+
+        actor = Actor(model_name, model_anims)
+        actor.reparentTo(scene)
+
+        # The main window needn't be drawn while the cells are rendered
+        main_window_active = base.win.isActive()
+        base.win.setActive(False)
+
+        sheet = PNMImage(frames * cell_size, len(self.animNames) * cell_size, 4)
+        cell = PNMImage()
+        for row, anim_name in enumerate(self.animNames):
+            control = actor.getAnimControl(anim_name)
+            for column in range(frames):
+                if control is not None:
+                    control.pose(column * control.getNumFrames() // frames)
+                    actor.update(force=True)
+
+                base.graphicsEngine.renderFrame()
+                texture.store(cell)
+                sheet.copySubImage(cell, column * cell_size, row * cell_size)
+
+        base.win.setActive(main_window_active)
+
+        # base.closeWindow only closes windows in base.winList, which
+        # texture buffers aren't; the camera has to leave base.camList too
+        actor.cleanup()
+        base.camList.remove(camera)
+        camera.removeNode()
+        base.graphicsEngine.removeWindow(buffer)
+        scene.removeNode()
+
+        self.texture = Texture("impostorSheet")
+        self.texture.load(sheet)
+
+        self.notify.info("Rendered %d impostor frames into a %dx%d sheet" %
+                         (len(self.animNames) * frames, sheet.getXSize(), sheet.getYSize()))
+
+    def get_uv_range(self, anim_name, frame):
+        # Rows are stored top down in the image, but v runs bottom up
+        row = self.animNames.index(anim_name) if anim_name in self.animNames else 0
+        u0 = frame / self.frames
+        v1 = 1 - row / len(self.animNames)
+        return u0, v1 - 1 / len(self.animNames), u0 + 1 / self.frames, v1
+
+
+class ImpostorRenderer:
+    def __init__(self, entities, sheet, parent):
+        self.entities = entities
+        self.sheet = sheet
+
+        # Every card is part of one Geom; as with the health bar, only
+        # the first count * 6 vertices are drawn.
+        self.capacity = 0
+        self.count = 0
+        vertex_data = GeomVertexData("impostors", GeomVertexFormat.getV3c4t2(), Geom.UHDynamic)
+        triangles = GeomTriangles(Geom.UHDynamic)
+
+        geom = Geom(vertex_data)
+        geom.addPrimitive(triangles)
+        geom_node = GeomNode("impostors")
+        geom_node.addGeom(geom)
+
+        self.nodePath = parent.attachNewNode(geom_node)
+        self.nodePath.setTexture(sheet.texture)
+        self.nodePath.setTransparency(True)
+        self.nodePath.setLightOff()
+
+        # Entities currently drawn as cards
+        self.impostors = set()
+
+    def set_impostor(self, entity, animator, impostor):
+        animator.impostor = impostor
+        if impostor:
+            animator.actor.getGeomNode().stash()
+            self.impostors.add(entity)
+        else:
+            animator.actor.getGeomNode().unstash()
+            self.impostors.discard(entity)
+
+    def update(self, player_pos, crowd_ranks):
+        transforms = self.entities.query(Transform)
+        animators = self.entities.query(Animator)
+        vitals = self.entities.query(Vitals)
+        chasers = self.entities.query(ChaserAI)
+
+        # Dead enemies play their death as actors
+        for entity in list(self.impostors):
+            if chasers.get(entity) is None:
+                animator = animators.get(entity)
+                if animator is not None:
+                    self.set_impostor(entity, animator, False)
+                else:
+                    self.impostors.discard(entity)
+
+        max_actors = impostor_count.getValue()
+        max_distance = impostor_distance.getValue()
+        cards = []
+        for entity in chasers.entities:
+            transform = transforms.get(entity)
+            animator = animators.get(entity)
+
+            distance = (transform.pos - player_pos).length()
+            if animator.impostor:
+                impostor = crowd_ranks[entity] >= max_actors or distance > max_distance - SWAP_MARGIN
+            else:
+                impostor = crowd_ranks[entity] >= max_actors or distance > max_distance
+            if impostor != animator.impostor:
+                self.set_impostor(entity, animator, impostor)
+
+            if impostor:
+                body = vitals.get(entity)
+                cards.append((transform, animator, max(body.health / body.maxHealth, 0)))
+
+        self.write_cards(cards)
+
+    def write_cards(self, cards):
+        geom = self.nodePath.node().modifyGeom(0)
+        vertex_data = geom.modifyVertexData()
+        if len(cards) > self.capacity:
+            self.capacity = max(len(cards), self.capacity * 2, 16)
+            vertex_data.setNumRows(self.capacity * 6)
+
+        sheet = self.sheet
+        extent = sheet.extent
+        vertex = GeomVertexWriter(vertex_data, "vertex")
+        color = GeomVertexWriter(vertex_data, "color")
+        texcoord = GeomVertexWriter(vertex_data, "texcoord")
+
+        for transform, animator, shade in cards:
+            pos = transform.pos
+            heading = math.radians(transform.nodePath.getH())
+            right_x = math.cos(heading) * extent
+            right_y = math.sin(heading) * extent
+            up_x = -right_y
+            up_y = right_x
+
+            control = animator.controls.get(animator.state)
+            if control is not None:
+                frame = control.getFrame() * sheet.frames // max(control.getNumFrames(), 1)
+                u0, v0, u1, v1 = sheet.get_uv_range(animator.state, min(frame, sheet.frames - 1))
+            else:
+                u0, v0, u1, v1 = sheet.get_uv_range("stand", 0)
+
+            corners = [
+                (pos.x - right_x - up_x, pos.y - right_y - up_y, u0, v0),
+                (pos.x + right_x - up_x, pos.y + right_y - up_y, u1, v0),
+                (pos.x + right_x + up_x, pos.y + right_y + up_y, u1, v1),
+                (pos.x - right_x + up_x, pos.y - right_y + up_y, u0, v1)
+            ]
+            for corner in [0, 1, 2, 0, 2, 3]:
+                corner_x, corner_y, u, v = corners[corner]
+                vertex.setData3(corner_x, corner_y, pos.z + CARD_HEIGHT)
+                color.setData4(shade, shade, shade, 1)
+                texcoord.setData2(u, v)
+
+        self.count = len(cards)
+        geom.modifyPrimitive(0).setNonindexedVertices(0, self.count * 6)
+
+    def clear(self):
+        self.impostors = set()
+        self.write_cards([])
+
+    def cleanup(self):
+        self.nodePath.removeNode()
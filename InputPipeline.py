@@ -0,0 +1,172 @@
+from collections import deque
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import ClockObject
+from panda3d.core import Plane, Point3
+from panda3d.core import Vec2, Vec3
+
+
+class InputPipeline:
+    notify = directNotify.newCategory("InputPipeline")
+
+    def __init__(self, control_names):
+        self.clock = ClockObject.getGlobalClock()
+
+        # Button edges (name, pressed, event time, arrival time) received
+        # since the last frame
+        self.edges = []
+
+        # Times of the edges that the current frame acted on
+        self.frameEdgeTimes = []
+
+        self.down = {}
+        self.heldTimes = {}
+        self.pressedThisFrame = {}
+        for control_name in control_names:
+            self.down[control_name] = False
+            self.heldTimes[control_name] = 0
+            self.pressedThisFrame[control_name] = False
+
+        self.frameTime = self.clock.getRealTime()
+
+        self.mousePos = Vec2(0, 0)
+
+        # Seconds from an input event to the end of the frame that drew its
+        # result
+        self.latencies = deque(maxlen=120)
+        self.frameLatency = 0
+
+    def record(self, control_name, pressed, time=None):
+        # Button throwers with their time flag set pass the event time. On
+        # Windows that is when the key was pressed; X11 stamps events with
+        # the time of the frame that polled them instead, which begin_frame
+        # can tell by it falling before the frame started.
+        self.edges.append((control_name, pressed, time, self.clock.getRealTime()))
+
+    def sample_mouse(self, mouse_watcher):
+        if mouse_watcher is not None and mouse_watcher.hasMouse():
+            self.mousePos = Vec2(mouse_watcher.getMouse())
+
+    def begin_frame(self, dt):
+        frame_start = self.frameTime
+        frame_end = self.clock.getRealTime()
+        self.frameTime = frame_end
+        frame_length = frame_end - frame_start
+
+        down_since = {}
+        held = {}
+        for control_name, down in self.down.items():
+            down_since[control_name] = frame_start if down else None
+            held[control_name] = 0
+            self.pressedThisFrame[control_name] = False
+
+        for control_name, pressed, time, arrival_time in self.edges:
+            if pressed == self.down[control_name]:
+                continue
+
+            if time is not None and frame_start <= time <= frame_end:
+                self.frameEdgeTimes.append(time)
+            else:
+                # Without the time of the event itself, the control counts
+                # as held for the whole frame
+                time = frame_start if pressed else frame_end
+                self.frameEdgeTimes.append(arrival_time)
+
+            if pressed:
+                down_since[control_name] = time
+                self.pressedThisFrame[control_name] = True
+            else:
+                held[control_name] += time - down_since[control_name]
+                down_since[control_name] = None
+            self.down[control_name] = pressed
+        self.edges = []
+
+        # Scale the real time each control was held to simulation time
+        for control_name in self.down:
+            if down_since[control_name] is not None:
+                held[control_name] += frame_end - down_since[control_name]
+            if frame_length > 0:
+                self.heldTimes[control_name] = held[control_name] / frame_length * dt
+            else:
+                self.heldTimes[control_name] = dt if self.is_active(control_name) else 0
+
+    def end_frame(self):
+        # Called once the frame has been rendered
+        frame_end = self.clock.getRealTime()
+
+        self.frameLatency = 0
+        for time in self.frameEdgeTimes:
+            latency = frame_end - time
+            self.latencies.append(latency)
+            self.frameLatency = max(self.frameLatency, latency)
+        self.frameEdgeTimes = []
+
+    def held_time(self, control_name):
+        return self.heldTimes[control_name]
+
+    def is_active(self, control_name):
+        return self.down[control_name] or self.pressedThisFrame[control_name]
+
+    def average_latency(self):
+        if len(self.latencies) == 0:
+            return 0
+        return sum(self.latencies) / len(self.latencies)
+
+
+class GroundAim:
+    def __init__(self, camera, lens, render):
+        self.camera = camera
+        self.lens = lens
+        self.render = render
+        self.plane = Plane(Vec3(0, 0, 1), Vec3(0, 0, 0))
+
+        self.cameraTransform = None
+        self.projectionMat = None
+
+        # With the camera looking straight at the ground, screen to
+        # ground is an affine map: origin + x * xAxis + y * yAxis.
+        self.affine = False
+        self.origin = Point3()
+        self.xAxis = Vec3()
+        self.yAxis = Vec3()
+
+        self.lastMousePos = None
+        self.lastPoint = Point3()
+
+    def intersect(self, mouse_pos):
+        point = Point3()
+        near_point = Point3()
+        far_point = Point3()
+
+        self.lens.extrude(mouse_pos, near_point, far_point)
+
+        self.plane.intersectsLine(point,
+                                  self.render.getRelativePoint(self.camera, near_point),
+                                  self.render.getRelativePoint(self.camera, far_point))
+        return point
+
+    def rebuild(self):
+        self.cameraTransform = self.camera.getTransform(self.render)
+        self.projectionMat = self.lens.getProjectionMat()
+        self.lastMousePos = None
+
+        forward = self.render.getRelativeVector(self.camera, Vec3(0, 1, 0))
+        self.affine = abs(forward.normalized().dot(self.plane.getNormal())) > 0.9999
+        if self.affine:
+            self.origin = self.intersect(Vec2(0, 0))
+            self.xAxis = self.intersect(Vec2(1, 0)) - self.origin
+            self.yAxis = self.intersect(Vec2(0, 1)) - self.origin
+
+    def project(self, mouse_pos):
+        if self.camera.getTransform(self.render) != self.cameraTransform or \
+                self.lens.getProjectionMat() != self.projectionMat:
+            self.rebuild()
+
+        if mouse_pos != self.lastMousePos:
+            self.lastMousePos = Vec2(mouse_pos)
+            if self.affine:
+                self.lastPoint = self.origin + self.xAxis * mouse_pos.x + self.yAxis * mouse_pos.y
+            else:
+                self.lastPoint = self.intersect(mouse_pos)
+
+        return Point3(self.lastPoint)
@@ -0,0 +1,109 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import ConfigVariableInt
+from panda3d.core import LightAttrib
+from panda3d.core import PointLight
+from panda3d.core import RenderState
+from panda3d.core import Vec4
+
+dynamic_light_budget = ConfigVariableInt("dynamic-light-budget", 1)
+
+
+class DynamicLight:
+    def __init__(self, node_path):
+        self.nodePath = node_path
+        self.light = node_path.node()
+        self.color = Vec4(1, 1, 1, 1)
+        self.intensity = 0
+        self.inUse = False
+
+        # Whether the light is part of the root's LightAttrib
+        self.attached = False
+
+    def configure(self, color, attenuation):
+        self.color = Vec4(color)
+        self.light.setAttenuation(attenuation)
+        self.set_intensity(0)
+
+    def set_pos(self, pos):
+        self.nodePath.setPos(pos)
+
+    # Only the colour changes, so the render state of the scene stays the
+    # same and no shaders need to be regenerated.
+    def set_intensity(self, intensity):
+        if intensity == self.intensity:
+            return
+        self.intensity = intensity
+        self.light.setColor(self.color * intensity)
+
+    def turn_off(self):
+        self.set_intensity(0)
+
+
+class LightManager:
+    notify = directNotify.newCategory("LightManager")
+
+    def __init__(self, render, parent=None):
+        self.render = render
+
+        self.stateChanges = 0
+        self.newStates = 0
+        self.lastNumStates = RenderState.getNumStates()
+
+        if parent is None:
+            parent = render
+
+        self.slots = []
+        for i in range(dynamic_light_budget.getValue()):
+            light = PointLight("dynamicLight%d" % i)
+            light.setColor(Vec4(0, 0, 0, 1))
+            self.slots.append(DynamicLight(parent.attachNewNode(light)))
+
+        self.lightAttrib = render.getAttrib(LightAttrib)
+
+    def acquire(self, color, attenuation):
+        for slot in self.slots:
+            if not slot.inUse:
+                slot.inUse = True
+                slot.configure(color, attenuation)
+                self.set_attached(slot, True)
+                return slot
+
+        self.notify.warning("Dynamic light budget of %d exhausted" % len(self.slots))
+        return None
+
+    def release(self, slot):
+        if slot is None:
+            return
+        slot.turn_off()
+        self.set_attached(slot, False)
+        slot.inUse = False
+
+    # A light that is merely turned off is still evaluated by the shader
+    # for every lit pixel, so one that won't be used for a while is taken
+    # off the root instead; that is a single change to its state.
+    def set_attached(self, slot, attached):
+        if slot.attached == attached:
+            return
+        slot.attached = attached
+        if attached:
+            self.render.setLight(slot.nodePath)
+        else:
+            slot.turn_off()
+            self.render.clearLight(slot.nodePath)
+
+    def update(self):
+        # Any change to the lights on the root makes every state below it
+        # be recomposed, so it should stay the same from frame to frame
+        light_attrib = self.render.getAttrib(LightAttrib)
+        self.stateChanges = 0 if light_attrib == self.lightAttrib else 1
+        self.lightAttrib = light_attrib
+
+        num_states = RenderState.getNumStates()
+        self.newStates = max(0, num_states - self.lastNumStates)
+        self.lastNumStates = num_states
+
+    def cleanup(self):
+        for slot in self.slots:
+            self.render.clearLight(slot.nodePath)
+            slot.nodePath.removeNode()
+        self.slots = []
@@ -0,0 +1,94 @@
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+
+from panda3d.core import MemoryUsage
+from panda3d.core import Vec3
+from panda3d.core import loadPrcFileData
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Report the memory taken by each live enemy and trap, "
+                                                 "on the Python heap and on Panda3D's heap.")
+    parser.add_argument("--count", type=int, default=50, help="number of each type to create")
+    parser.add_argument("--frames", type=int, default=2,
+                        help="frames to run with them alive before measuring")
+    return parser.parse_args(argv)
+
+
+def measure():
+    gc.collect()
+    python_size = tracemalloc.get_traced_memory()[0]
+    panda_size = MemoryUsage.getPandaHeapSingleSize() + MemoryUsage.getPandaHeapArraySize()
+    return python_size, panda_size
+
+
+def cleanup(game, objects):
+    for game_object in objects:
+        game_object.cleanup()
+
+    # Let anything released by the cleanup actually be freed
+    game.taskMgr.step()
+
+
+def measure_type(game, create, count, frames):
+    # The first instance loads the models and everything else shared
+    cleanup(game, [create(Vec3(0, 0, 0))])
+
+    before = measure()
+
+    objects = []
+    for i in range(count):
+        objects.append(create(Vec3(random.uniform(-6, 6), random.uniform(-6, 6), 0)))
+    for _ in range(frames):
+        game.taskMgr.step()
+
+    after = measure()
+
+    cleanup(game, objects)
+
+    return (after[0] - before[0]) / count, (after[1] - before[1]) / count
+
+
+def main(argv):
+    args = parse_args(argv)
+
+    loadPrcFileData("memory", "\n".join([
+        "window-type offscreen",
+        "load-display p3tinydisplay",
+        "audio-library-name null"
+    ]))
+
+    random.seed(0)
+
+    from Game import Game
+    from GameObject import TrapEnemy, WalkingEnemy
+    game = Game()
+    game.start_game()
+
+    # Only the objects created here should be alive
+    game.spawnTimer = float("inf")
+    cleanup(game, game.trapEnemies)
+    game.trapEnemies = []
+
+    tracemalloc.start()
+
+    results = [
+        ("walking enemy", measure_type(game, WalkingEnemy, args.count, args.frames)),
+        ("trap", measure_type(game, TrapEnemy, args.count, args.frames))
+    ]
+
+    tracemalloc.stop()
+
+    print("%-14s %12s %12s %12s" % ("bytes per", "python", "panda", "total"))
+    for name, (python_size, panda_size) in results:
+        print("%-14s %12.0f %12.0f %12.0f" % (name, python_size, panda_size, python_size + panda_size))
+
+    game.exit_game()
+    game.destroy()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
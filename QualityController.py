@@ -0,0 +1,112 @@
+from collections import deque
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import AudioSound
+from panda3d.core import ConfigVariableBool, ConfigVariableDouble, ConfigVariableInt
+
+# Features are stepped down in this order, and restored in reverse.
+BEAM_HIT_LIGHT = "beamHitLight"
+DISTANT_ENEMY_ANIMATION = "distantEnemyAnimation"
+EFFECT_MODELS = "effectModels"
+SOUND_POLYPHONY = "soundPolyphony"
+
+QUALITY_STEPS = [
+    BEAM_HIT_LIGHT,
+    DISTANT_ENEMY_ANIMATION,
+    EFFECT_MODELS,
+    SOUND_POLYPHONY
+]
+
+adaptive_quality = ConfigVariableBool("quality-adaptive", True)
+frame_budget = ConfigVariableDouble("quality-frame-budget", 1.0 / 60.0)
+sample_window = ConfigVariableInt("quality-sample-window", 30)
+downgrade_ratio = ConfigVariableDouble("quality-downgrade-ratio", 1.1)
+upgrade_ratio = ConfigVariableDouble("quality-upgrade-ratio", 0.75)
+step_cooldown = ConfigVariableDouble("quality-step-cooldown", 1.0)
+distant_enemy_distance = ConfigVariableDouble("quality-distant-enemy-distance", 6.0)
+distant_animation_stride = ConfigVariableInt("quality-distant-animation-stride", 3)
+reduced_polyphony = ConfigVariableInt("quality-reduced-polyphony", 2)
+
+# Throttled enemies have to come this much closer than
+# quality-distant-enemy-distance before they animate at full rate again.
+DISTANT_ENEMY_MARGIN = 0.5
+
+
+class QualityController:
+    notify = directNotify.newCategory("QualityController")
+
+    def __init__(self):
+        self.enabled = adaptive_quality.getValue()
+        self.budget = frame_budget.getValue()
+        self.downgradeRatio = downgrade_ratio.getValue()
+        self.upgradeRatio = upgrade_ratio.getValue()
+        self.stepCooldown = step_cooldown.getValue()
+
+        self.distantEnemyDistance = distant_enemy_distance.getValue()
+        self.distantAnimationStride = max(1, distant_animation_stride.getValue())
+        self.reducedPolyphony = reduced_polyphony.getValue()
+
+        self.frameTimes = deque(maxlen=max(1, sample_window.getValue()))
+        self.cooldownTimer = self.stepCooldown
+
+        # Number of entries of QUALITY_STEPS currently switched off
+        self.level = 0
+        self.soundsThisFrame = 0
+
+    def reset(self):
+        self.frameTimes.clear()
+        self.cooldownTimer = self.stepCooldown
+        if self.level > 0:
+            self.notify.info("Restoring full quality")
+        self.level = 0
+
+    def is_enabled(self, feature):
+        return QUALITY_STEPS.index(feature) >= self.level
+
+    def average_frame_time(self):
+        if len(self.frameTimes) == 0:
+            return 0
+        return sum(self.frameTimes) / len(self.frameTimes)
+
+    def update(self, dt):
+        self.soundsThisFrame = 0
+
+        if not self.enabled:
+            return
+
+        self.frameTimes.append(dt)
+
+        self.cooldownTimer -= dt
+        if self.cooldownTimer > 0 or len(self.frameTimes) < self.frameTimes.maxlen:
+            return
+
+        average = self.average_frame_time()
+        if average > self.budget * self.downgradeRatio and self.level < len(QUALITY_STEPS):
+            self.notify.info("Average frame time %.2fms over budget %.2fms; disabling %s" %
+                             (average * 1000, self.budget * 1000, QUALITY_STEPS[self.level]))
+            self.level += 1
+            self.frameTimes.clear()
+            self.cooldownTimer = self.stepCooldown
+        elif average < self.budget * self.upgradeRatio and self.level > 0:
+            self.level -= 1
+            self.notify.info("Average frame time %.2fms under budget %.2fms; restoring %s" %
+                             (average * 1000, self.budget * 1000, QUALITY_STEPS[self.level]))
+            self.frameTimes.clear()
+            self.cooldownTimer = self.stepCooldown
+
+    def animation_stride(self, distance_to_player, throttled=False):
+        distance = self.distantEnemyDistance
+        if throttled:
+            distance -= DISTANT_ENEMY_MARGIN
+        if self.is_enabled(DISTANT_ENEMY_ANIMATION) or distance_to_player < distance:
+            return 1
+        return self.distantAnimationStride
+
+    def play_sound(self, sound):
+        if sound is None:
+            return
+        if not self.is_enabled(SOUND_POLYPHONY):
+            if sound.status() == AudioSound.PLAYING or self.soundsThisFrame >= self.reducedPolyphony:
+                return
+        self.soundsThisFrame += 1
+        sound.play()
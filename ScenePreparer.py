@@ -0,0 +1,57 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from panda3d.core import BoundingVolume
+from panda3d.core import ConfigVariableBool
+
+from SceneStats import count_scene
+
+
+class ScenePreparer:
+    notify = directNotify.newCategory("ScenePreparer")
+
+    def __init__(self, render):
+        self.render = render
+
+        # Static geometry and the arena walls, flattened once by prepare()
+        self.staticRoot = render.attachNewNode("static")
+        self.wallRoot = render.attachNewNode("walls")
+
+        # Dynamic objects, grouped so that each group is culled as a whole
+        self.dynamicRoots = {}
+        for name in ["player", "enemies", "traps", "effects"]:
+            root = render.attachNewNode(name)
+            root.node().setBoundsType(BoundingVolume.BT_box)
+            self.dynamicRoots[name] = root
+
+        # Colliders that are never drawn; hiding the root keeps the
+        # cull traversal out of them without affecting collisions.
+        self.colliderRoot = render.attachNewNode("colliders")
+
+        self.report = None
+
+    def get_root(self, group):
+        if group is None:
+            return self.render
+        return self.dynamicRoots[group]
+
+    def prepare(self):
+        before = count_scene(self.render)
+
+        self.staticRoot.flattenStrong()
+
+        # Collision nodes are only merged by the flattener on request;
+        # walls that share a name and masks become one node.
+        flatten_collision_nodes = ConfigVariableBool("flatten-collision-nodes")
+        previous_value = flatten_collision_nodes.getValue()
+        flatten_collision_nodes.setValue(True)
+        self.wallRoot.flattenStrong()
+        flatten_collision_nodes.setValue(previous_value)
+
+        self.wallRoot.hide()
+        self.colliderRoot.hide()
+
+        after = count_scene(self.render)
+        self.report = {"before": before, "after": after}
+
+        self.notify.info("Prepared scene: %d -> %d nodes, %d -> %d Geoms" %
+                         (before["nodes"], after["nodes"], before["geoms"], after["geoms"]))
+        return self.report
@@ -0,0 +1,90 @@
+import time
+
+from panda3d.core import NodePath
+from panda3d.core import PythonCallbackObject
+from panda3d.core import SceneGraphAnalyzer
+
+
+def count_scene(*roots):
+    analyzer = SceneGraphAnalyzer()
+    for root in roots:
+        analyzer.addNode(root.node())
+
+    return {
+        "nodes": analyzer.getNumNodes(),
+        "geomNodes": analyzer.getNumGeomNodes(),
+        "geoms": analyzer.getNumGeoms()
+    }
+
+
+def find_visible_geom_nodes(root):
+    geom_node_paths = [node_path for node_path in root.findAllMatches("**/+GeomNode")
+                       if not node_path.isHidden()]
+
+    # DirectGui widgets draw the subgraph of their current state, which
+    # is not part of the scene graph itself.
+    for item_path in root.findAllMatches("**/+PGItem"):
+        if item_path.isHidden():
+            continue
+        item = item_path.node()
+        state_def = item.getStateDef(item.getState())
+        geom_node_paths += find_visible_geom_nodes(state_def)
+        if state_def.node().isGeomNode() and not state_def.isHidden():
+            geom_node_paths.append(state_def)
+
+    # Text is generated on demand, too
+    for text_path in root.findAllMatches("**/+TextNode"):
+        if not text_path.isHidden():
+            geom_node_paths += find_visible_geom_nodes(NodePath(text_path.node().getInternalGeom()))
+
+    return geom_node_paths
+
+
+def count_draw_calls(*roots):
+    return sum(node_path.node().getNumGeoms()
+               for root in roots for node_path in find_visible_geom_nodes(root))
+
+
+def count_render_states(*roots):
+    # The number of distinct composed states among the visible Geoms;
+    # with Panda's state-sorted draw this is the number of state
+    # changes the renderer has to make in a frame.
+    states = set()
+    for root in roots:
+        for geom_node_path in find_visible_geom_nodes(root):
+            geom_node = geom_node_path.node()
+            net_state = geom_node_path.getNetState()
+            for i in range(geom_node.getNumGeoms()):
+                states.add(net_state.compose(geom_node.getGeomState(i)))
+    return len(states)
+
+
+class RenderTimer:
+    def __init__(self, window):
+        self.cullTime = 0
+        self.drawTime = 0
+
+        self.displayRegions = [region for region in window.getActiveDisplayRegions()]
+        for region in self.displayRegions:
+            region.setCullCallback(PythonCallbackObject(self.cull))
+            region.setDrawCallback(PythonCallbackObject(self.draw))
+
+    def reset(self):
+        self.cullTime = 0
+        self.drawTime = 0
+
+    def cull(self, callback_data):
+        start = time.perf_counter()
+        callback_data.upcall()
+        self.cullTime += time.perf_counter() - start
+
+    def draw(self, callback_data):
+        start = time.perf_counter()
+        callback_data.upcall()
+        self.drawTime += time.perf_counter() - start
+
+    def cleanup(self):
+        for region in self.displayRegions:
+            region.clearCullCallback()
+            region.clearDrawCallback()
+        self.displayRegions = []
@@ -0,0 +1,86 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from panda3d.core import loadPrcFileData
+
+# Time from launch until the first frame has been rendered, in seconds
+STARTUP_TARGET = 1.5
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Trace the game's start-up: time spent importing each "
+                                                 "module and in each step of Game.__init__, and check "
+                                                 "the time to the first frame against a target.")
+    parser.add_argument("--target", type=float, default=STARTUP_TARGET,
+                        help="fail if the first frame takes longer than this many seconds")
+    parser.add_argument("--eager", action="store_true",
+                        help="build all UI and load the music before the first frame")
+    parser.add_argument("--imports", type=int, default=15,
+                        help="number of slowest imports to list")
+    parser.add_argument("--window", action="store_true",
+                        help="open a real window rather than rendering offscreen")
+    return parser.parse_args(argv)
+
+
+def trace_imports():
+    # Imports are only traced in a fresh interpreter, as they are cached after
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import Game"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stderr=subprocess.PIPE, universal_newlines=True).stderr
+
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue
+        imports.append((fields[2].strip(), int(fields[0]) / 1e6, int(fields[1]) / 1e6))
+    return imports
+
+
+def main(argv):
+    args = parse_args(argv)
+
+    prc_lines = [
+        "audio-library-name null",
+        "lazy-startup %s" % ("false" if args.eager else "true")
+    ]
+    if not args.window:
+        prc_lines += ["window-type offscreen", "load-display p3tinydisplay"]
+    loadPrcFileData("startup", "\n".join(prc_lines))
+
+    start = time.perf_counter()
+    from Game import Game
+    import_time = time.perf_counter() - start
+
+    game = Game()
+    game.taskMgr.step()
+    first_frame_time = time.perf_counter() - start
+
+    imports = trace_imports()
+    imports.sort(key=lambda entry: entry[1], reverse=True)
+
+    print("%-40s %10s %12s" % ("slowest imports", "self", "cumulative"))
+    for module_name, self_time, cumulative_time in imports[:args.imports]:
+        print("%-40s %8.1fms %10.1fms" % (module_name, self_time * 1000, cumulative_time * 1000))
+
+    print()
+    print("%-18s %10.1fms" % ("import Game", import_time * 1000))
+    print(game.startupTrace.report())
+    print()
+
+    passed = first_frame_time <= args.target
+    print("First frame after %.1fms (target %.1fms): %s" %
+          (first_frame_time * 1000, args.target * 1000, "ok" if passed else "TOO SLOW"))
+
+    game.exit_game()
+    game.destroy()
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,25 @@
+import time
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+
+class StartupTrace:
+    notify = directNotify.newCategory("StartupTrace")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.steps = []
+
+    def mark(self, step_name):
+        now = time.perf_counter()
+        self.steps.append((step_name, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self):
+        lines = ["%-18s %10.1fms" % (step_name, duration * 1000) for step_name, duration in self.steps]
+        lines.append("%-18s %10.1fms" % ("total", self.total() * 1000))
+        return "\n".join(lines)
@@ -0,0 +1,83 @@
+import json
+import math
+
+from panda3d.core import CardMaker
+from panda3d.core import Filename
+from panda3d.core import Geom, GeomNode, GeomTriangles
+from panda3d.core import GeomVertexData, GeomVertexFormat, GeomVertexWriter
+from panda3d.core import NodePath
+from panda3d.core import Point2
+from panda3d.core import VirtualFileSystem
+
+# Written by BuildUIAtlas.py
+ATLAS_INDEX = "UI/atlas.json"
+
+
+class UIAtlas:
+    def __init__(self, loader):
+        index_data = VirtualFileSystem.getGlobalPtr().readFile(Filename(ATLAS_INDEX), True)
+        index = json.loads(index_data)
+
+        self.texture = loader.loadTexture(index["image"])
+        self.regions = index["regions"]
+
+    def make_card(self, image, frame):
+        u0, v0, u1, v1 = self.regions[image]
+
+        card_maker = CardMaker(image)
+        card_maker.setFrame(*frame)
+        card_maker.setUvRange(Point2(u0, v0), Point2(u1, v1))
+
+        card = NodePath(card_maker.generate())
+        card.setTexture(self.texture)
+        card.setTransparency(True)
+        return card
+
+
+class HealthBar:
+    def __init__(self, atlas, max_health, pos, spacing, scale, parent):
+        self.maxHealth = max_health
+
+        u0, v0, u1, v1 = atlas.regions["UI/health.png"]
+
+        # Two triangles per segment, unshared, so that showing the first
+        # n segments is a matter of drawing the first n * 6 vertices.
+        vertex_data = GeomVertexData("healthBar", GeomVertexFormat.getV3t2(), Geom.UHStatic)
+        vertex_data.setNumRows(max_health * 6)
+        vertex = GeomVertexWriter(vertex_data, "vertex")
+        texcoord = GeomVertexWriter(vertex_data, "texcoord")
+
+        for i in range(max_health):
+            x = i * spacing
+            corners = [
+                (x - scale, -scale, u0, v0),
+                (x + scale, -scale, u1, v0),
+                (x + scale, scale, u1, v1),
+                (x - scale, scale, u0, v1)
+            ]
+            for corner in [0, 1, 2, 0, 2, 3]:
+                corner_x, corner_z, u, v = corners[corner]
+                vertex.addData3(corner_x, 0, corner_z)
+                texcoord.addData2(u, v)
+
+        triangles = GeomTriangles(Geom.UHStatic)
+        triangles.setNonindexedVertices(0, max_health * 6)
+
+        geom = Geom(vertex_data)
+        geom.addPrimitive(triangles)
+
+        geom_node = GeomNode("healthBar")
+        geom_node.addGeom(geom)
+
+        self.nodePath = parent.attachNewNode(geom_node)
+        self.nodePath.setPos(pos)
+        self.nodePath.setTexture(atlas.texture)
+        self.nodePath.setTransparency(True)
+
+    def set_value(self, health):
+        segments = int(math.ceil(min(max(health, 0), self.maxHealth)))
+        geom = self.nodePath.node().modifyGeom(0)
+        geom.modifyPrimitive(0).setNonindexedVertices(0, segments * 6)
+
+    def cleanup(self):
+        self.nodePath.removeNode()